@@ -0,0 +1,55 @@
+"""
+@desc: Two-level cache of answers of MedicalBot.
+"""
+import time
+import unicodedata
+
+from app.utils.cache import LRUCache
+
+# trailing punctuation which does not change a question, after NFKC normalization
+trailing_punctuation = "?!.,~。、"
+
+
+def normalize_question(question):
+    """Full-width characters to half-width, lower case, no whitespace or trailing punctuation. """
+    question = unicodedata.normalize("NFKC", question).lower()
+    return "".join(question.split()).rstrip(trailing_punctuation)
+
+
+class AnswerCache(object):
+    """Answers cached by normalized question, and by parsed query so that different wordings of
+    a question share one answer. Entities of a query are identified by (type, name), which is
+    unique in the graph.
+
+    Keys of both levels start with the build version of the knowledge graph the answer is
+    found in, so an answer found in an older build, even if put after the graph is switched,
+    is never returned for a newer one. Both levels are dropped when the build version changes.
+    """
+
+    def __init__(self, question_size=10000, query_size=10000, ttl=3600, clock=time.monotonic):
+        self.questions = LRUCache(question_size, ttl, clock)  # normalized question -> answer
+        self.queries = LRUCache(query_size, ttl, clock)  # (intent, entities) -> answer
+        self.build_version = None
+
+    @staticmethod
+    def question_key(build_version, question):
+        return build_version, normalize_question(question)
+
+    @staticmethod
+    def query_key(build_version, query):
+        # entities in the order of names, so wordings mentioning them in another order share a key
+        return build_version, query.intent, tuple(sorted(query.entities))
+
+    def check_version(self, build_version):
+        """Drop every answer if the graph is of another build than the cached answers. """
+        if build_version != self.build_version:
+            self.clear()
+            self.build_version = build_version
+
+    def clear(self):
+        self.questions.clear()
+        self.queries.clear()
+
+    def stats(self):
+        return {"build_version": self.build_version, "question": self.questions.stats(),
+                "query": self.queries.stats()}
@@ -0,0 +1,172 @@
+"""
+@desc: Versioned bundle of the prebuilt artifacts MedicalBot runs on, loaded lazily.
+
+A bundle directory looks like
+
+    <root>/CURRENT              name of the version in use
+    <root>/<version>/manifest.json
+    <root>/<version>/graph.snapshot
+    <root>/<version>/name/*.txt
+    <root>/<version>/linker.pkl
+    <root>/<version>/intent.pt
+
+where the version is derived from the build version of the graph and the intent model, so
+a new build never overwrites the files of one a worker may be running on. Nothing heavy is
+imported or loaded when a `Bundle` is opened: every component is loaded on first use, or
+all at once by `warm_up`.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import zipfile
+
+from app.kg.schema import entity_types
+from app.utils.lazy import Lazy
+
+bundle_format = 1
+manifest_file = "manifest.json"
+current_file = "CURRENT"
+snapshot_file = "graph.snapshot"
+name_dir = "name"
+linker_file = "linker.pkl"
+intent_file = "intent.pt"
+
+
+def is_exported_model(file_path):
+    """True for a TorchScript file of `export.export_recognizer`, False for a checkpoint. """
+    with zipfile.ZipFile(file_path) as archive:
+        return any(name.endswith("extra/meta.json") for name in archive.namelist())
+
+
+def write_bundle(root, snapshot_path, name_data_path, intent_model_path):
+    """Copy a graph snapshot, its name lists and an intent model into a new version of the bundle
+    in `root`, compile the entity linker, and make it the current version. Return the version. """
+    from app.kg.snapshot import GraphSnapshot
+    from app.nlu.entity_linker import EntityLinker
+
+    with GraphSnapshot(snapshot_path) as snapshot:
+        build_version = snapshot.build_version
+    digest = hashlib.sha1(build_version.encode("utf-8"))
+    with open(intent_model_path, "rb") as file:
+        digest.update(file.read())
+    version = digest.hexdigest()[:16]
+
+    path = os.path.join(root, version)
+    if not os.path.exists(path):
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(os.path.join(tmp_path, name_dir))
+        shutil.copyfile(snapshot_path, os.path.join(tmp_path, snapshot_file))
+        for _, file_name in entity_types:
+            name_path = os.path.join(name_data_path, file_name + ".txt")
+            if os.path.exists(name_path):
+                shutil.copyfile(name_path, os.path.join(tmp_path, name_dir, file_name + ".txt"))
+        EntityLinker.from_dictionaries(os.path.join(tmp_path, name_dir), os.path.join(tmp_path, linker_file))
+        shutil.copyfile(intent_model_path, os.path.join(tmp_path, intent_file))
+        manifest = {"format": bundle_format, "version": version, "build_version": build_version,
+                    "intent_exported": is_exported_model(intent_model_path)}
+        with open(os.path.join(tmp_path, manifest_file), "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(tmp_path, path)
+
+    tmp_path = os.path.join(root, current_file + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(version + "\n")
+    os.replace(tmp_path, os.path.join(root, current_file))
+    return version
+
+
+class Bundle(object):
+    # components in the order `warm_up` loads them, the cheap ones needed by every question first
+    components = ("entity_linker", "query_engine", "intent_recognizer", "fuzzy_matcher", "symptom_ranker")
+
+    def __init__(self, root, version=None):
+        """Open a version of the bundle in `root`, by default the current one. """
+        if version is None:
+            with open(os.path.join(root, current_file), "r", encoding="utf-8") as file:
+                version = file.read().strip()
+        self.path = os.path.join(root, version)
+        with open(os.path.join(self.path, manifest_file), "r", encoding="utf-8") as file:
+            self.manifest = json.load(file)
+        if self.manifest["format"] != bundle_format:
+            raise ValueError("{} is a bundle of format {}, expected {}".format(
+                self.path, self.manifest["format"], bundle_format))
+        self.version = self.manifest["version"]
+        self.build_version = self.manifest["build_version"]
+
+        self.snapshot = Lazy(self._load_snapshot, "snapshot")
+        self.query_engine = Lazy(self._load_query_engine, "query_engine")
+        self.entity_linker = Lazy(self._load_entity_linker, "entity_linker")
+        self.fuzzy_matcher = Lazy(self._load_fuzzy_matcher, "fuzzy_matcher")
+        self.symptom_ranker = Lazy(self._load_symptom_ranker, "symptom_ranker")
+        self.intent_recognizer = Lazy(self._load_intent_recognizer, "intent_recognizer")
+        self._warm_up_thread = None
+        self.error = None  # exception raised while warming up in background
+
+    def _load_snapshot(self):
+        from app.kg.snapshot import GraphSnapshot
+        return GraphSnapshot(os.path.join(self.path, snapshot_file))
+
+    def _load_query_engine(self):
+        from app.query import QueryEngine
+        from app.query.local import LocalBackend
+        return QueryEngine(LocalBackend(self.snapshot.get()))
+
+    def _load_entity_linker(self):
+        from app.nlu.entity_linker import EntityLinker
+        return EntityLinker.from_dictionaries(os.path.join(self.path, name_dir), os.path.join(self.path, linker_file))
+
+    def _load_fuzzy_matcher(self):
+        from app.nlu.fuzzy_matcher import FuzzyMatcher
+        return FuzzyMatcher.from_dictionaries(os.path.join(self.path, name_dir))
+
+    def _load_symptom_ranker(self):
+        from app.query.symptom_ranker import SymptomRanker
+        return SymptomRanker.from_snapshot(self.snapshot.get())
+
+    def _load_intent_recognizer(self):
+        from app.nlu.medical_intent_recognizer.intent_recognizer import IntentRecognizer
+        file_path = os.path.join(self.path, intent_file)
+        if self.manifest["intent_exported"]:
+            return IntentRecognizer.load_exported(file_path)
+        return IntentRecognizer.load(file_path)
+
+    def semantic_parser(self):
+        """A `SemanticParser` on the lazily loaded components. """
+        from app.nlu.semantic_parser import SemanticParser
+        return SemanticParser(self.intent_recognizer, self.entity_linker, self.fuzzy_matcher)
+
+    def warm_up(self, background=False):
+        """Load every component now, or in a daemon thread if `background`. """
+        if not background:
+            for name in self.components:
+                getattr(self, name).get()
+            return
+        if self._warm_up_thread is None:
+            self._warm_up_thread = threading.Thread(target=self._warm_up, name="bundle-warm-up", daemon=True)
+            self._warm_up_thread.start()
+
+    def _warm_up(self):
+        try:
+            self.warm_up()
+        except Exception as e:
+            self.error = e
+
+    def ready(self):
+        """True once every component is loaded. """
+        return all(getattr(self, name).loaded for name in self.components)
+
+    def wait(self, timeout=None):
+        """Wait for a background warm up, and return whether every component is loaded. The
+        exception of a failed warm up is raised here. """
+        if self._warm_up_thread is not None:
+            self._warm_up_thread.join(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.ready()
+
+    def close(self):
+        if self.snapshot.loaded:
+            self.snapshot.get().close()
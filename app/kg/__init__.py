@@ -0,0 +1,3 @@
+"""
+@desc: Storage of the knowledge graph of disease.
+"""
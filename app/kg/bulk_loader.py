@@ -0,0 +1,160 @@
+"""
+@desc: Online loading of the graph into a running neo4j with batched UNWIND writes.
+
+Unlike neo4j-admin import of the exported csv files, which needs a new and stopped
+database, the loader writes into a live one: a uniqueness constraint on the name of every
+type of entity is created first, then entities and relationships are merged by name in
+batches of parameterized `UNWIND $rows` statements, which several sessions of a pooled
+driver run concurrently. Merging makes loading a newer build over an older one safe, though
+entities and relationships missing from the newer build are not deleted.
+
+Neo4j 3.5 and later are supported. The syntax of constraints follows the version of the
+server, and a database other than the default one needs 4.0 or later.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import re
+import time
+
+from app.kg.schema import entity_type_disease, entity_types, relationship_types
+from app.utils.metrics import metrics
+
+
+min_server_version = (3, 5)
+
+version_statement = ("CALL dbms.components() YIELD name, versions WHERE name = 'Neo4j Kernel' "
+                     "RETURN versions[0] AS version")
+
+
+def parse_version(text):
+    """(major, minor) of a version like 4.4.12 or 2025.01.0. """
+    return tuple(int(part) for part in re.findall(r"\d+", text)[:2])
+
+
+def constraint_statement(label, server_version=(4, 4)):
+    if server_version >= (4, 4):
+        return "CREATE CONSTRAINT {0}_name IF NOT EXISTS FOR (n:{0}) REQUIRE n.name IS UNIQUE".format(label)
+    # the only syntax before 4.4, creating an existing constraint again fails on 4.0 to 4.3,
+    # see `is_existing_constraint`
+    return "CREATE CONSTRAINT ON (n:{}) ASSERT n.name IS UNIQUE".format(label)
+
+
+def is_existing_constraint(error):
+    """Whether a neo4j error is of creating a constraint which exists already. """
+    return getattr(error, "code", None) == "Neo.ClientError.Schema.EquivalentSchemaRuleAlreadyExists"
+
+
+def node_statement(label, with_props=False):
+    statement = "UNWIND $rows AS row MERGE (n:{} {{name: row.name}}) SET n.id = row.id".format(label)
+    return statement + " SET n += row.props" if with_props else statement
+
+
+def edge_statement(rel_type, from_type, to_type):
+    return ("UNWIND $rows AS row MATCH (a:{} {{name: row.start}}) MATCH (b:{} {{name: row.end}}) "
+            "MERGE (a)-[:{}]->(b)").format(from_type, to_type, rel_type)
+
+
+def write_rows(tx, statement, rows):
+    tx.run(statement, {"rows": rows}).consume()
+
+
+class BulkLoader(object):
+    def __init__(self, driver, database=None, batch_size=10000, num_sessions=4):
+        """`driver` is a neo4j driver, like one of `app.query.cypher.create_driver`, whose pool
+        should have at least `num_sessions` connections. """
+        self.driver = driver
+        self.database = database
+        self.batch_size = batch_size
+        self.num_sessions = num_sessions
+        self.server_version = None
+
+    def _session(self):
+        return self.driver.session(**({"database": self.database} if self.database else {}))
+
+    def check_server(self):
+        """Find the version of the server, and raise ValueError if it cannot be loaded into. """
+        # the default database, as a server before 4.0 has no other
+        with self.driver.session() as session:
+            text = session.run(version_statement).single()["version"]
+        self.server_version = parse_version(text)
+        if self.server_version < min_server_version:
+            raise ValueError("neo4j {} is not supported, loading needs {}.{} or later".format(
+                text, *min_server_version))
+        if self.database and self.server_version < (4, 0):
+            raise ValueError("neo4j {} has only the default database, loading into {} needs 4.0 or later".format(
+                text, self.database))
+        return self.server_version
+
+    def create_constraints(self, labels=None):
+        """Create the uniqueness constraint on names, which also indexes the names merged on. """
+        server_version = self.server_version or self.check_server()
+        with self._session() as session:
+            for label in labels or [label for label, _ in entity_types]:
+                try:
+                    session.run(constraint_statement(label, server_version)).consume()
+                except Exception as e:
+                    # loading into a database loaded before, on a server without IF NOT EXISTS
+                    if not is_existing_constraint(e):
+                        raise
+
+    def write_batch(self, statement, rows, kind):
+        start = time.perf_counter()
+        with self._session() as session:
+            # a managed transaction is retried on transient errors such as deadlocks of
+            # concurrent batches locking the same entities
+            execute_write = getattr(session, "execute_write", None) or session.write_transaction
+            execute_write(write_rows, statement, rows)
+        metrics.observe("kbqa_load_batch_seconds", time.perf_counter() - start, kind=kind)
+        metrics.count("kbqa_load_rows_total", len(rows), kind=kind)
+        return len(rows)
+
+    def run_batches(self, batches):
+        """Write (statement, rows, kind) batches in `num_sessions` concurrent sessions, keeping
+        at most two batches a session in flight, and return the number of rows written. """
+        written = 0
+        with ThreadPoolExecutor(max_workers=self.num_sessions) as executor:
+            pending = set()
+            for statement, rows, kind in batches:
+                if len(pending) >= self.num_sessions * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    written += sum(future.result() for future in done)
+                pending.add(executor.submit(self.write_batch, statement, rows, kind))
+            written += sum(future.result() for future in pending)
+        return written
+
+    def node_batches(self, store):
+        for label, _ in entity_types:
+            ids = store.entity_ids(label).tolist()
+            with_props = label == entity_type_disease
+            statement = node_statement(label, with_props)
+            for begin in range(0, len(ids), self.batch_size):
+                rows = []
+                for identity in ids[begin:begin + self.batch_size]:
+                    row = {"name": store.name_of(identity), "id": identity}
+                    if with_props:
+                        row["props"] = {attr: value for attr, value in
+                                        zip(store.attributes, store.attribute_values(identity)) if value is not None}
+                    rows.append(row)
+                yield statement, rows, "entity"
+
+    def edge_batches(self, store):
+        for rel_type, from_type, to_type, _ in relationship_types:
+            edges = store.edges(rel_type)
+            statement = edge_statement(rel_type, from_type, to_type)
+            # edges are sorted by start, so concurrent batches mostly lock different entities
+            for begin in range(0, len(edges), self.batch_size):
+                yield statement, [{"start": store.name_of(start), "end": store.name_of(end)}
+                                  for start, end in edges[begin:begin + self.batch_size].tolist()], "relationship"
+
+    def load(self, store):
+        """Load the entities and relationships of a deduplicated `GraphStore`. Every entity is
+        written before any relationship, so the MATCH of both ends never misses. """
+        start = time.perf_counter()
+        self.check_server()
+        self.create_constraints()
+        num_nodes = self.run_batches(self.node_batches(store))
+        num_edges = self.run_batches(self.edge_batches(store))
+        seconds = time.perf_counter() - start
+        print("Loaded {} entities and {} relationships in {:.1f}s with {} sessions.".format(
+            num_nodes, num_edges, seconds, self.num_sessions))
+        metrics.observe("kbqa_build_seconds", seconds, stage="load")
+        return num_nodes, num_edges
@@ -0,0 +1,73 @@
+"""
+@desc: Streaming writers of the csv files for neo4j-admin import.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import csv
+import gzip
+import io
+
+# number of relationships converted to python objects at a time
+chunk_size = 65536
+
+
+@contextmanager
+def open_csv(file_name, compress=False):
+    """Open a csv file for writing, gzip compressed if `compress`, which neo4j-admin reads as well.
+
+    The gzip header has no file name nor mtime, so the same graph always gives the same bytes.
+    """
+    if not compress:
+        with open(file_name, "w", encoding="utf-8", newline="") as file:
+            yield file
+        return
+    with open(file_name, "wb") as raw, \
+            gzip.GzipFile(filename="", mode="wb", compresslevel=6, fileobj=raw, mtime=0) as compressed, \
+            io.TextIOWrapper(compressed, encoding="utf-8", newline="") as file:
+        yield file
+
+
+def write_nodes(file_name, node_label, ids, names, attributes=None, values=None, compress=False):
+    """Write entities as rows of name, properties, id and label.
+
+    `names` and `values` are iterables aligned with `ids`, each item of `values` is the
+    list of properties named by `attributes`.
+    """
+    attributes = attributes or []
+    with open_csv(file_name, compress) as file:
+        writer = csv.writer(file, lineterminator="\n")
+        writer.writerow(["name"] + list(attributes) + ["id:ID", ":LABEL"])
+        if attributes:
+            writer.writerows([name] + props + [identity, node_label]
+                             for identity, name, props in zip(ids, names, values))
+        else:
+            writer.writerows((name, identity, node_label) for identity, name in zip(ids, names))
+
+
+def write_edges(file_name, edge_type, edges, compress=False):
+    """Write relationships from a sequence or an (n, 2) array of (start, end) ids. """
+    with open_csv(file_name, compress) as file:
+        writer = csv.writer(file, lineterminator="\n")
+        writer.writerow([":START_ID", ":END_ID", ":TYPE"])
+        for begin in range(0, len(edges), chunk_size):
+            chunk = edges[begin:begin + chunk_size]
+            if hasattr(chunk, "tolist"):
+                chunk = chunk.tolist()
+            writer.writerows((start, end, edge_type) for start, end in chunk)
+
+
+def run_concurrently(tasks, max_workers=4):
+    """Run (function, args) tasks in a thread pool and raise the first error if any.
+
+    Writing is mostly spent in csv formatting and zlib, the latter of which releases
+    the GIL, so threads are enough to overlap compression and disk io.
+    """
+    if max_workers <= 1:
+        for func, args in tasks:
+            func(*args)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(func, *args) for func, args in tasks]
+        for future in futures:
+            future.result()
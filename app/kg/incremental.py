@@ -0,0 +1,137 @@
+"""
+@desc: Persistent state for incremental rebuild of the knowledge graph.
+"""
+from array import array
+from collections import Counter
+import os
+import pickle
+
+from app.kg.store import GraphStore
+
+
+class Delta(object):
+    """Changes of the graph made by one incremental build. """
+
+    def __init__(self, version):
+        self.version = version
+        self.nodes_added = []  # ids of new entities, and of diseases whose properties changed
+        self.nodes_removed = []  # ids of entities referred by nothing anymore
+        self.edges_added = []  # (type, start, end)
+        self.edges_removed = []  # (type, start, end)
+        self.attributes = {}  # id of disease -> properties from the records of this build
+
+    def is_empty(self):
+        return not (self.nodes_added or self.nodes_removed or self.edges_added or self.edges_removed)
+
+
+class IncrementalState(object):
+    """What is needed to extract only the new or changed records of medical.json.
+
+    A record is identified by the hash of its line, so a changed line is a removed record
+    plus an added one. The name -> id map is persisted as the string table of the store,
+    so ids of existing entities never change. Every relationship and entity is reference
+    counted by the records containing it, and is removed when the count drops to zero.
+
+    Properties of a disease come from the first record of it that is still alive. If that
+    record is removed while another unchanged record of the same disease remains, the
+    properties are kept as they were.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.labels = None
+        self.names = []
+        self.label_codes = array("b")
+        self.records = {}  # hash of line -> (id of disease, tuple of (type, start, end))
+        self.edge_refs = Counter()  # (type, start, end) -> number of records containing it
+        # id -> number of alive relationships and records referring to it
+        self.node_refs = Counter()
+        self.attribute_owners = {}  # id of disease -> hash of record its properties come from
+
+    @classmethod
+    def load(cls, file_path):
+        if not os.path.exists(file_path):
+            return cls()
+        with open(file_path, "rb") as file:
+            return pickle.load(file)
+
+    def save(self, file_path):
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, file_path)
+
+    def restore_store(self):
+        """Create a store holding all the entities that have ever been assigned an id. """
+        store = GraphStore(labels=self.labels)
+        for name, code in zip(self.names, self.label_codes):
+            store.add(store.labels[code], name)
+        return store
+
+    def apply(self, store, added, removed):
+        """Remove and add records and return the changes of the graph.
+
+        `added` maps hash of line to (id of disease, relationships, properties of disease),
+        `removed` is a collection of hashes of records that are not in the file anymore.
+        The string table of `store` is taken as the new name -> id map.
+        """
+        self.version += 1
+        delta = Delta(self.version)
+        edges_before = {}  # touched relationship -> whether it was alive before
+        nodes_before = {}  # touched entity -> whether it was alive before
+
+        def ref_node(identity, count):
+            nodes_before.setdefault(identity, self.node_refs[identity] > 0)
+            self.node_refs[identity] += count
+
+        def ref_edge(edge, count):
+            alive = self.edge_refs[edge] > 0
+            edges_before.setdefault(edge, alive)
+            self.edge_refs[edge] += count
+            if alive != (self.edge_refs[edge] > 0):
+                ref_node(edge[1], count)
+                ref_node(edge[2], count)
+
+        for key in removed:
+            disease_id, edges = self.records.pop(key)
+            ref_node(disease_id, -1)
+            for edge in edges:
+                ref_edge(edge, -1)
+            if self.attribute_owners.get(disease_id) == key:
+                del self.attribute_owners[disease_id]
+
+        for key, (disease_id, edges, attributes) in added.items():
+            edges = tuple(set(edges))
+            self.records[key] = (disease_id, edges)
+            ref_node(disease_id, 1)
+            for edge in edges:
+                ref_edge(edge, 1)
+            if disease_id not in self.attribute_owners:
+                self.attribute_owners[disease_id] = key
+                delta.attributes[disease_id] = attributes
+
+        for edge, alive in edges_before.items():
+            if self.edge_refs[edge] <= 0:
+                del self.edge_refs[edge]
+                if alive:
+                    delta.edges_removed.append(edge)
+            elif not alive:
+                delta.edges_added.append(edge)
+
+        for identity, alive in nodes_before.items():
+            if self.node_refs[identity] <= 0:
+                del self.node_refs[identity]
+                if alive:
+                    delta.nodes_removed.append(identity)
+            elif not alive or identity in delta.attributes:
+                delta.nodes_added.append(identity)
+
+        delta.nodes_added.sort()
+        delta.nodes_removed.sort()
+        delta.edges_added.sort()
+        delta.edges_removed.sort()
+
+        self.labels = store.labels
+        self.names = store.names
+        self.label_codes = store.label_codes
+        return delta
@@ -0,0 +1,69 @@
+"""
+@desc: Types of entities and relationships in the knowledge graph of disease.
+"""
+
+entity_type_disease = "Disease"
+entity_type_symptom = "Symptom"
+entity_type_drug = "Drug"
+entity_type_check = "Check"
+entity_type_department = "Department"
+entity_type_food = "Food"
+entity_type_recipe = "Recipe"
+entity_type_pharm_company = "PharmCompany"
+entity_type_treatment = "Treatment"
+
+rels_type_recommend_drug = "RECOMMEND_DRUG"
+rels_type_recommend_recipe = "RECOMMEND_RECIPE"
+rels_type_avoid_eat = "AVOID_EAT"
+rels_type_advise_eat = "ADVISE_EAT"
+rels_type_has_symptom = "HAS_SYMPTOM"
+rels_type_has_complication = "HAS_COMPLICATION"
+rels_type_common_drug = "COMMON_DRUG"
+rels_type_need_check = "NEED_CHECK"
+rels_type_treat_department = "TREAT_DEPARTMENT"
+rels_type_belongs_to = "BELONGS_TO"
+rels_type_produce_drug = "PRODUCE_DRUG"
+rels_type_treatment_method = "TREATMENT_METHOD"
+
+# (entity type, name of exported file)
+entity_types = [
+    (entity_type_disease, "disease"),
+    (entity_type_symptom, "symptom"),
+    (entity_type_drug, "drug"),
+    (entity_type_check, "check"),
+    (entity_type_department, "department"),
+    (entity_type_food, "food"),
+    (entity_type_recipe, "recipe"),
+    (entity_type_pharm_company, "pharm_company"),
+    (entity_type_treatment, "treatment"),
+]
+
+# (relationship type, type of start entity, type of end entity, name of exported file)
+relationship_types = [
+    (rels_type_belongs_to, entity_type_department, entity_type_department, "belongs_to"),
+    (rels_type_avoid_eat, entity_type_disease, entity_type_food, "avoid_eat"),
+    (rels_type_advise_eat, entity_type_disease, entity_type_food, "advise_eat"),
+    (rels_type_recommend_recipe, entity_type_disease, entity_type_recipe, "recommend_recipe"),
+    (rels_type_common_drug, entity_type_disease, entity_type_drug, "common_drug"),
+    (rels_type_recommend_drug, entity_type_disease, entity_type_drug, "recommend_drug"),
+    (rels_type_need_check, entity_type_disease, entity_type_check, "need_check"),
+    (rels_type_produce_drug, entity_type_pharm_company, entity_type_drug, "produce_drug"),
+    (rels_type_has_complication, entity_type_disease, entity_type_disease, "has_complication"),
+    (rels_type_has_symptom, entity_type_disease, entity_type_symptom, "has_symptom"),
+    (rels_type_treat_department, entity_type_disease, entity_type_department, "treat_department"),
+    (rels_type_treatment_method, entity_type_disease, entity_type_treatment, "treatment_method"),
+]
+
+# properties of disease besides its name
+disease_attributes = [
+    "desc",
+    "prevent",
+    "cause",
+    "susceptible_populations",
+    "treatment_cycle",
+    "cure_rate",
+    "treatment_cost",
+    "is_healthcare_disease",
+    "prevalence_ratio",
+    "infection_mode",
+]
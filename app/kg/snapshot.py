@@ -0,0 +1,239 @@
+"""
+@desc: Binary snapshot of the knowledge graph which is opened with mmap.
+
+Layout of the file:
+    magic (8 bytes) | length of header (uint64) | header (json) | arrays
+
+Every array starts at a multiple of 64 bytes and is described in the header by its
+offset, dtype and shape, so the loader maps it with np.frombuffer without copying.
+Entities are renumbered as nodes 0..n-1 grouped by type, so every type of entity is
+a contiguous range of nodes. Each relationship type has a CSR (offsets + targets)
+adjacency array in the forward direction, with a row for each node of the start type,
+and one in the reverse direction, with a row for each node of the end type.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from app.kg.schema import entity_type_disease, relationship_types
+
+magic = b"KBQASNP1"
+alignment = 64
+
+
+def _encode_strings(strings):
+    """Encode strings as (offsets, bytes) of a string table. """
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _csr(rows, cols, num_rows):
+    order = np.lexsort((cols, rows))
+    counts = np.bincount(rows, minlength=num_rows)
+    offsets = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, cols[order].astype(np.int32)
+
+
+def write_snapshot(store, file_path):
+    """Write entities, relationships and disease properties of a deduplicated store.
+
+    Return the build version of the snapshot, which is the sha1 of its arrays.
+    """
+    arrays = {}
+    labels = []
+    ids = []
+    start = 0
+    for label in store.labels:
+        label_ids = store.entity_ids(label)
+        labels.append({"label": label, "start": start, "stop": start + len(label_ids)})
+        ids.append(label_ids)
+        start += len(label_ids)
+    node_ids = np.concatenate(ids).astype(np.int32) if ids else np.empty(0, dtype=np.int32)
+    label_ranges = {item["label"]: (item["start"], item["stop"]) for item in labels}
+
+    arrays["node_ids"] = node_ids
+    names = [store.name_of(i) for i in node_ids.tolist()]
+    arrays["name_offsets"], arrays["name_bytes"] = _encode_strings(names)
+    # nodes of every type sorted by name, for looking up a node by binary search
+    name_order = np.empty(len(node_ids), dtype=np.int32)
+    for begin, end in label_ranges.values():
+        name_order[begin:end] = sorted(range(begin, end), key=lambda n: names[n].encode("utf-8"))
+    arrays["name_order"] = name_order
+
+    node_of_id = np.full(store.next_id, -1, dtype=np.int32)
+    node_of_id[node_ids] = np.arange(len(node_ids), dtype=np.int32)
+    relationships = []
+    for rel_type, from_type, to_type, _ in relationship_types:
+        edges = store.edges(rel_type)
+        starts = node_of_id[edges[:, 0]]
+        ends = node_of_id[edges[:, 1]]
+        from_start, from_stop = label_ranges[from_type]
+        to_start, to_stop = label_ranges[to_type]
+        arrays[rel_type + ".out.offsets"], arrays[rel_type + ".out.targets"] = \
+            _csr(starts - from_start, ends, from_stop - from_start)
+        arrays[rel_type + ".in.offsets"], arrays[rel_type + ".in.targets"] = \
+            _csr(ends - to_start, starts, to_stop - to_start)
+        relationships.append({"type": rel_type, "from": from_type, "to": to_type, "count": len(edges)})
+
+    disease_start, disease_stop = label_ranges[entity_type_disease]
+    disease_ids = node_ids[disease_start:disease_stop].tolist()
+    values = [store.attribute_values(i) for i in disease_ids]
+    for no, attr in enumerate(store.attributes):
+        arrays["attr." + attr + ".offsets"], arrays["attr." + attr + ".bytes"] = \
+            _encode_strings([v[no] or "" for v in values])
+
+    digest = hashlib.sha1()
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        offset = -(-offset // alignment) * alignment
+        layout[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset += array.nbytes
+        digest.update(name.encode("utf-8"))
+        digest.update(array.tobytes())
+    build_version = digest.hexdigest()
+
+    header = json.dumps({
+        "build_version": build_version,
+        "labels": labels,
+        "relationships": relationships,
+        "attributes": store.attributes,
+        "arrays": layout,
+    }, ensure_ascii=False).encode("utf-8")
+    data_start = -(-(len(magic) + 8 + len(header)) // alignment) * alignment
+
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(magic)
+        file.write(struct.pack("<Q", len(header)))
+        file.write(header)
+        for name, array in arrays.items():
+            file.seek(data_start + layout[name]["offset"])
+            file.write(array.tobytes())
+        file.truncate(data_start + offset)
+    os.replace(tmp_path, file_path)
+    return build_version
+
+
+class GraphSnapshot(object):
+    """Read-only view of a snapshot file backed by mmap.
+
+    Nothing but the header is parsed when opening, and every array is a view of the
+    mapped file, so processes opening the same snapshot share its pages.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        with open(file_path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(magic)] != magic:
+            raise ValueError("{} is not a snapshot of knowledge graph".format(file_path))
+        header_length, = struct.unpack_from("<Q", self._mmap, len(magic))
+        header_start = len(magic) + 8
+        header = json.loads(self._mmap[header_start:header_start + header_length].decode("utf-8"))
+        data_start = -(-(header_start + header_length) // alignment) * alignment
+
+        self.build_version = header["build_version"]
+        self.attributes = header["attributes"]
+        self.label_ranges = {item["label"]: (item["start"], item["stop"]) for item in header["labels"]}
+        self.relationships = {item["type"]: (item["from"], item["to"]) for item in header["relationships"]}
+
+        self._arrays = {}
+        for name, item in header["arrays"].items():
+            dtype = np.dtype(item["dtype"])
+            count = int(np.prod(item["shape"]))
+            self._arrays[name] = np.frombuffer(self._mmap, dtype=dtype, count=count,
+                                               offset=data_start + item["offset"]).reshape(item["shape"])
+        self._name_offsets = self._arrays["name_offsets"]
+        self._name_bytes = self._arrays["name_bytes"]
+        self._name_order = self._arrays["name_order"]
+        self.node_ids = self._arrays["node_ids"]
+
+    def close(self):
+        self._arrays = {}
+        self._name_offsets = self._name_bytes = self._name_order = self.node_ids = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # arrays returned to the caller still refer to the mapping, it is unmapped when they are freed
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def num_nodes(self):
+        return len(self.node_ids)
+
+    def label_of(self, node):
+        for label, (start, stop) in self.label_ranges.items():
+            if start <= node < stop:
+                return label
+        raise IndexError(node)
+
+    def _name_bytes_of(self, node):
+        return self._name_bytes[self._name_offsets[node]:self._name_offsets[node + 1]].tobytes()
+
+    def name_of(self, node):
+        return self._name_bytes_of(node).decode("utf-8")
+
+    def find(self, label, name):
+        """Return the node of an entity by its type and name, or None if not found. """
+        key = name.encode("utf-8")
+        low, high = self.label_ranges[label]
+        while low < high:
+            mid = (low + high) // 2
+            if self._name_bytes_of(self._name_order[mid]) < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self.label_ranges[label][1]:
+            node = int(self._name_order[low])
+            if self._name_bytes_of(node) == key:
+                return node
+        return None
+
+    def node_of_id(self, label, identity):
+        """Return the node of an entity by its id in the exported csv files, or None. """
+        start, stop = self.label_ranges[label]
+        pos = start + int(np.searchsorted(self.node_ids[start:stop], identity))
+        if pos < stop and self.node_ids[pos] == identity:
+            return pos
+        return None
+
+    def neighbors(self, rel_type, node, reverse=False):
+        """Nodes related to a node by a type of relationship, as an int32 array.
+
+        Forward neighbors of a disease by HAS_SYMPTOM are its symptoms, and reverse
+        neighbors of a symptom are the diseases having it.
+        """
+        direction = "in" if reverse else "out"
+        label = self.relationships[rel_type][1 if reverse else 0]
+        row = node - self.label_ranges[label][0]
+        offsets = self._arrays[rel_type + "." + direction + ".offsets"]
+        return self._arrays[rel_type + "." + direction + ".targets"][offsets[row]:offsets[row + 1]]
+
+    def adjacency(self, rel_type, reverse=False):
+        """The (offsets, targets) CSR arrays of a type of relationship. """
+        direction = "in" if reverse else "out"
+        return (self._arrays[rel_type + "." + direction + ".offsets"],
+                self._arrays[rel_type + "." + direction + ".targets"])
+
+    def attribute(self, node, attr):
+        """Property of a disease, empty if unknown. """
+        row = node - self.label_ranges[entity_type_disease][0]
+        offsets = self._arrays["attr." + attr + ".offsets"]
+        data = self._arrays["attr." + attr + ".bytes"]
+        return data[offsets[row]:offsets[row + 1]].tobytes().decode("utf-8")
@@ -0,0 +1,149 @@
+"""
+@desc: Compact in-memory store of entities and relationships.
+"""
+from array import array
+
+import numpy as np
+
+from app.kg.schema import entity_types, relationship_types, disease_attributes
+
+
+def _edge_keys(starts, ends):
+    """Pack (start, end) pairs of non-negative int32 ids into int64 keys ordered by start, end. """
+    return starts.astype(np.int64) << 32 | ends.astype(np.int64)
+
+
+class GraphStore(object):
+    """Array backed store of the knowledge graph.
+
+    All names are interned into one string table, and the id of an entity is its
+    position in the table plus one. Relationships of every type are kept as two int32
+    columns of start and end ids, and attributes of diseases are kept by column.
+    """
+
+    def __init__(self, labels=None, rel_types=None, attributes=None):
+        self.labels = [label for label, _ in entity_types] if labels is None else list(labels)
+        self.rel_types = [rel for rel, _, _, _ in relationship_types] if rel_types is None else list(rel_types)
+        self.attributes = list(disease_attributes) if attributes is None else list(attributes)
+
+        self.names = []  # string table, name of entity with id i is names[i - 1]
+        self.label_codes = array("b")  # index of label of entity with id i is label_codes[i - 1]
+        self._label_index = {label: no for no, label in enumerate(self.labels)}
+        self._ids = {label: {} for label in self.labels}  # name -> id for each type of entity
+
+        # relationships appended since last deduplication, (start ids, end ids)
+        self._pending = {rel: (array("i"), array("i")) for rel in self.rel_types}
+        # deduplicated relationships, each is an int32 array of shape (n, 2)
+        self._edges = {rel: np.empty((0, 2), dtype=np.int32) for rel in self.rel_types}
+
+        self._attribute_rows = {}  # id of entity -> row in attribute columns
+        self._attribute_columns = {attr: [] for attr in self.attributes}
+
+    @property
+    def next_id(self):
+        return len(self.names) + 1
+
+    def add(self, label, name):
+        """Add a new entity and return its id. """
+        identity = len(self.names) + 1
+        self.names.append(name)
+        self.label_codes.append(self._label_index[label])
+        self._ids[label][name] = identity
+        return identity
+
+    def get_id(self, label, name):
+        return self._ids[label].get(name)
+
+    def get_or_add(self, label, name):
+        identity = self._ids[label].get(name)
+        if identity is None:
+            identity = self.add(label, name)
+        return identity
+
+    def name_of(self, identity):
+        return self.names[identity - 1]
+
+    def label_of(self, identity):
+        return self.labels[self.label_codes[identity - 1]]
+
+    def num_entities(self, label=None):
+        if label is None:
+            return len(self.names)
+        return len(self._ids[label])
+
+    def entity_names(self, label):
+        """Names of entities of the label in the order they were added. """
+        return self._ids[label].keys()
+
+    def entity_ids(self, label):
+        """Ids of entities of the label in ascending order. """
+        codes = np.frombuffer(self.label_codes, dtype=np.int8) if self.label_codes else np.empty(0, np.int8)
+        return np.flatnonzero(codes == self._label_index[label]).astype(np.int32) + 1
+
+    def set_attributes(self, identity, values):
+        """Set attributes of an entity from a dict, missing attributes are set as None. """
+        row = self._attribute_rows.get(identity)
+        if row is None:
+            self._attribute_rows[identity] = len(self._attribute_rows)
+            for attr in self.attributes:
+                self._attribute_columns[attr].append(values.get(attr))
+        else:
+            for attr in self.attributes:
+                self._attribute_columns[attr][row] = values.get(attr)
+
+    def get_attributes(self, identity):
+        """Return attributes of an entity as a dict, or None if it has never been set. """
+        row = self._attribute_rows.get(identity)
+        if row is None:
+            return None
+        return {attr: self._attribute_columns[attr][row] for attr in self.attributes}
+
+    def attribute_values(self, identity):
+        """Values of attributes of an entity as a list, all None for entities without attributes. """
+        row = self._attribute_rows.get(identity)
+        if row is None:
+            return [None] * len(self.attributes)
+        return [self._attribute_columns[attr][row] for attr in self.attributes]
+
+    def add_edge(self, rel_type, start, end):
+        starts, ends = self._pending[rel_type]
+        starts.append(start)
+        ends.append(end)
+
+    def pop_pending(self):
+        """Return relationships appended since last deduplication as (type, start, end) and discard them. """
+        edges = []
+        for rel in self.rel_types:
+            starts, ends = self._pending[rel]
+            edges.extend((rel, start, end) for start, end in zip(starts, ends))
+            self._pending[rel] = (array("i"), array("i"))
+        return edges
+
+    def dedupe(self):
+        """Merge pending relationships and remove duplicates.
+
+        Relationships of every type are sorted by (start, end) afterwards.
+        """
+        for rel in self.rel_types:
+            starts, ends = self._pending[rel]
+            if not starts:
+                continue
+            edges = self._edges[rel]
+            keys = np.unique(np.concatenate([
+                _edge_keys(edges[:, 0], edges[:, 1]),
+                _edge_keys(np.frombuffer(starts, dtype=np.int32), np.frombuffer(ends, dtype=np.int32)),
+            ]))
+            edges = np.empty((len(keys), 2), dtype=np.int32)
+            edges[:, 0] = keys >> 32
+            edges[:, 1] = keys & 0xFFFFFFFF
+            self._edges[rel] = edges
+            self._pending[rel] = (array("i"), array("i"))
+
+    def edges(self, rel_type):
+        """Deduplicated relationships of the type as an int32 array of shape (n, 2). """
+        return self._edges[rel_type]
+
+    def num_relationships(self, rel_type=None):
+        if rel_type is None:
+            return sum(len(edges) for edges in self._edges.values())
+        return len(self._edges[rel_type])
@@ -1,16 +1,148 @@
 """
 @author: Qinjuan Yang
 @time: 2022-03-28 23:41
-@desc: 
+@desc:
 """
+from app.kg.schema import (entity_type_disease, entity_type_symptom, rels_type_advise_eat, rels_type_avoid_eat,
+                           rels_type_belongs_to, rels_type_common_drug, rels_type_has_complication,
+                           rels_type_has_symptom, rels_type_need_check, rels_type_recommend_drug,
+                           rels_type_treat_department, rels_type_treatment_method)
+from app.query.base import Query
+from app.utils.metrics import answer_seconds, metrics
+
+# (attribute or relationship type, reverse) -> template of answer
+answer_templates = {
+    ("desc", False): "{name}：{values}",
+    ("cause", False): "{name}的病因：{values}",
+    ("cure_rate", False): "{name}的治愈率：{values}",
+    ("infection_mode", False): "{name}的传染方式：{values}",
+    ("prevent", False): "{name}的预防措施：{values}",
+    ("treatment_cost", False): "{name}的治疗费用：{values}",
+    ("treatment_cycle", False): "{name}的治疗周期：{values}",
+    (rels_type_treatment_method, False): "{name}的治疗方法有：{values}",
+    (rels_type_common_drug, False): "{name}的常用药品有：{values}",
+    (rels_type_recommend_drug, False): "{name}的推荐药品有：{values}",
+    (rels_type_has_symptom, False): "{name}的症状有：{values}",
+    (rels_type_need_check, False): "{name}需要做的检查有：{values}",
+    (rels_type_has_complication, False): "{name}的并发症有：{values}",
+    (rels_type_treat_department, False): "{name}的就诊科室：{values}",
+    (rels_type_belongs_to, False): "{name}属于：{values}",
+    (rels_type_avoid_eat, False): "{name}忌吃的食物：{values}",
+    (rels_type_advise_eat, False): "{name}宜吃的食物：{values}",
+    (rels_type_common_drug, True): "{name}常用于治疗：{values}",
+    (rels_type_recommend_drug, True): "{name}推荐用于治疗：{values}",
+    (rels_type_need_check, True): "{name}可用于检查：{values}",
+    (rels_type_has_complication, True): "{name}是以下疾病的并发症：{values}",
+    (rels_type_has_symptom, True): "有{name}症状的疾病：{values}",
+}
+
+
+def format_answer(facts):
+    """Render facts found for a question as text, None if nothing is found. """
+    lines = []
+    for fact in facts:
+        if fact.values:
+            template = answer_templates.get((fact.key, fact.reverse), "{name}：{values}")
+            lines.append(template.format(name=fact.name, values="、".join(fact.values)))
+    return "\n".join(lines) if lines else None
+
+
+def format_ranking(ranking):
+    if not ranking:
+        return None
+    return "可能的疾病：{}".format("、".join(name for name, _ in ranking))
+
+
+# a cached answer may be None, so a miss is told apart by this
+missing = object()
 
 
 class MedicalBot(object):
-    def __init__(self):
-        self.semantic_parser = None
+    def __init__(self, semantic_parser=None, query_engine=None, symptom_ranker=None, answer_cache=None):
+        self.semantic_parser = semantic_parser
+        self.query_engine = query_engine  # app.query.QueryEngine
+        self.symptom_ranker = symptom_ranker  # app.query.symptom_ranker.SymptomRanker
+        self.answer_cache = answer_cache  # app.answer_cache.AnswerCache
+        self.bundle = None  # app.bundle.Bundle the components are loaded from
+        self.num_ranked_diseases = 5
+
+    @classmethod
+    def from_bundle(cls, root, version=None, answer_cache=None, warm_up=False):
+        """A bot on the components of a bundle, loaded on first use, or in background if `warm_up`. """
+        from app.bundle import Bundle
+
+        bundle = Bundle(root, version)
+        bot = cls(bundle.semantic_parser(), bundle.query_engine, bundle.symptom_ranker, answer_cache)
+        bot.bundle = bundle
+        if warm_up:
+            bundle.warm_up(background=True)
+        return bot
+
+    def warm_up(self, background=False):
+        """Load the components of the bundle now, or start loading them in background. """
+        if self.bundle is not None:
+            self.bundle.warm_up(background)
+
+    def ready(self, timeout=0):
+        """Whether the bot answers without loading anything, after waiting up to `timeout`
+        seconds (None to wait as long as needed) for a warm up in background. """
+        return self.bundle is None or self.bundle.wait(timeout)
+
+    def load(self, snapshot):
+        """Switch a bot on a `LocalBackend` to another build of the graph, a `GraphSnapshot` or
+        the path of one, while it answers questions in other threads. The symptom ranker is
+        rebuilt from the new build and swapped in before the backend, so an answer under the new
+        build version is never ranked on the old one. """
+        from app.kg.snapshot import GraphSnapshot
+        from app.query.symptom_ranker import SymptomRanker
+
+        if isinstance(snapshot, str):
+            snapshot = GraphSnapshot(snapshot)
+        if self.symptom_ranker is not None:
+            self.symptom_ranker = SymptomRanker.from_snapshot(snapshot)
+        self.query_engine.backend.load(snapshot)
+
+    def build_version(self):
+        """Build version of the graph queried, None if the backend does not tell. """
+        return getattr(getattr(self.query_engine, "backend", None), "build_version", None)
 
     def answer(self, question):
-        res = self.semantic_parser.parse(question)
-        # ans = get_answer(res)
-        return None
+        # latency by intent, "cached" for an answer found by question, "none" for no entity found
+        with metrics.span(answer_seconds, intent="cached") as span:
+            cache = self.answer_cache
+            if cache is None:
+                query = self.semantic_parser.parse(question)
+                span.label(intent=query.intent if query else "none")
+                return self.answer_query(query)
+
+            # read once, so answers are put under the version of the build they are found in
+            build_version = self.build_version()
+            cache.check_version(build_version)
+            with metrics.stage("normalization"):
+                key = cache.question_key(build_version, question)
+            answer = cache.questions.get(key, missing)
+            if answer is missing:
+                query = self.semantic_parser.parse(question)
+                span.label(intent=query.intent if query else "none")
+                answer = None if query is None else cache.queries.get(cache.query_key(build_version, query), missing)
+                if answer is missing:
+                    answer = self.answer_query(query)
+                    cache.queries.put(cache.query_key(build_version, query), answer)
+                cache.questions.put(key, answer)
+            return answer
+
+    def answer_query(self, query):
+        if query is None:
+            return None
+
+        # several symptoms and no disease, e.g. I have A, B and C, what could it be
+        symptoms = [name for label, name in query.entities if label == entity_type_symptom]
+        if self.symptom_ranker is not None and len(symptoms) >= 2 and \
+                all(label != entity_type_disease for label, _ in query.entities):
+            with metrics.stage("symptom_ranking"):
+                ranking = self.symptom_ranker.rank(symptoms, self.num_ranked_diseases)
+            return format_ranking(ranking)
 
+        # facts in the order of names, so an answer does not depend on the wording of the question
+        facts = self.query_engine.execute(Query(query.intent, sorted(query.entities)))
+        return format_answer(facts)
@@ -0,0 +1,131 @@
+"""
+@desc: Entity linker matching names of entities in questions with an Aho-Corasick automaton.
+"""
+from collections import namedtuple
+import hashlib
+import os
+import pickle
+
+from app.kg.schema import entity_types
+
+# an entity mentioned in question[start:end], which may be of several types
+Mention = namedtuple("Mention", ["start", "end", "name", "labels"])
+
+
+def dictionary_files(name_data_path):
+    """(type of entity, path) of the name lists exported by `DiseaseGraphExtractor.export_as_dictionary`. """
+    return [(label, os.path.join(name_data_path, file_name + ".txt")) for label, file_name in entity_types]
+
+
+def read_names(files):
+    """(type of entity, name) of every name in a list of (type of entity, path of name list). """
+    for label, path in files:
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                name = line.rstrip("\n")
+                if name:
+                    yield label, name
+
+
+class EntityLinker(object):
+    """Finds all the names of a dictionary in a text in one pass.
+
+    The automaton is kept as flat lists indexed by state: `goto` of transitions,
+    `fail` of failure links, and `output` of the (length, types) of every name ending
+    at the state, including those reached through failure links.
+    """
+
+    cache_format = 1
+
+    def __init__(self, names):
+        """Compile the automaton from an iterable of (type of entity, name). """
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+
+        labels_of = {}  # state -> types of the name ending at the state
+        for label, name in names:
+            if not name:
+                continue
+            state = 0
+            for char in name:
+                nxt = self.goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][char] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                state = nxt
+            labels_of.setdefault(state, set()).add(label)
+            self.output[state] = ((len(name), labels_of[state]),)
+
+        # breadth first, so the failure link of a state is done before its children
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, nxt in self.goto[state].items():
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                fail = self.goto[fail].get(char, 0)
+                self.fail[nxt] = fail
+                self.output[nxt] = self.output[nxt] + self.output[fail]
+                queue.append(nxt)
+
+        self.output = [tuple((length, tuple(sorted(labels))) for length, labels in out) for out in self.output]
+
+    @classmethod
+    def from_dictionaries(cls, name_data_path, cache_path=None):
+        """Compile the automaton from the name lists, or load it from `cache_path`.
+
+        The cache is keyed by the sha1 of the name lists, and is rebuilt when they change.
+        """
+        files = [(label, path) for label, path in dictionary_files(name_data_path) if os.path.exists(path)]
+        digest = hashlib.sha1()
+        for label, path in files:
+            digest.update(label.encode("utf-8"))
+            with open(path, "rb") as file:
+                digest.update(file.read())
+        fingerprint = "{}:{}".format(cls.cache_format, digest.hexdigest())
+
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, "rb") as file:
+                cached_fingerprint, linker = pickle.load(file)
+            if cached_fingerprint == fingerprint:
+                return linker
+
+        linker = cls(read_names(files))
+        if cache_path:
+            tmp_path = cache_path + ".tmp"
+            with open(tmp_path, "wb") as file:
+                pickle.dump((fingerprint, linker), file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        return linker
+
+    def find_all(self, text):
+        """All the (start, end, types) of names in text, overlapping ones included. """
+        goto, fail, output = self.goto, self.fail, self.output
+        matches = []
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, labels in output[state]:
+                matches.append((end - length, end, labels))
+        return matches
+
+    def link(self, text):
+        """Mentions of entities in text, where longer names take precedence over the names they overlap. """
+        matches = self.find_all(text)
+        if not matches:
+            return []
+        matches.sort(key=lambda m: (m[0] - m[1], m[0]))
+        taken = [False] * len(text)
+        mentions = []
+        for start, end, labels in matches:
+            if not any(taken[start:end]):
+                taken[start:end] = [True] * (end - start)
+                mentions.append(Mention(start, end, text[start:end], labels))
+        mentions.sort()
+        return mentions
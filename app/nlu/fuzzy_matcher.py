@@ -0,0 +1,114 @@
+"""
+@desc: Fuzzy lookup of names of entities with an inverted index of character bigrams.
+"""
+from array import array
+from collections import namedtuple
+import os
+
+from app.kg.schema import entity_type_disease, entity_type_symptom
+from app.nlu.entity_linker import Mention, dictionary_files, read_names
+
+FuzzyMatch = namedtuple("FuzzyMatch", ["name", "labels", "similarity"])
+
+
+def bigrams(text):
+    """Distinct character bigrams of text padded with boundary marks, so a single character has two. """
+    padded = "\x02" + text + "\x03"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def bounded_distance(a, b, bound):
+    """Levenshtein distance of a and b, or bound + 1 as soon as it is known to exceed bound. """
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > bound:
+            return bound + 1
+        prev = cur
+    return prev[-1] if prev[-1] <= bound else bound + 1
+
+
+class FuzzyMatcher(object):
+    """Finds the names closest to a misspelled or colloquial one.
+
+    Candidates are the names sharing enough bigrams with the query: k edits destroy at
+    most 2k of its distinct bigrams, so a name within distance k shares at least
+    (number of bigrams of query - 2k) of them. Candidates are then verified with an edit
+    distance bounded by k, where k follows from the similarity threshold, and
+    similarity = 1 - distance / max(length of query, length of name).
+    """
+
+    def __init__(self, names):
+        """Build the index from an iterable of (type of entity, name). """
+        self.names = []
+        self.labels = []
+        index_of = {}
+        for label, name in names:
+            no = index_of.get(name)
+            if no is None:
+                no = index_of[name] = len(self.names)
+                self.names.append(name)
+                self.labels.append(set())
+            self.labels[no].add(label)
+        self.labels = [tuple(sorted(labels)) for labels in self.labels]
+
+        self.postings = {}  # bigram -> indexes of names having it
+        for no, name in enumerate(self.names):
+            for gram in bigrams(name):
+                self.postings.setdefault(gram, array("i")).append(no)
+
+    @classmethod
+    def from_dictionaries(cls, name_data_path, labels=(entity_type_disease, entity_type_symptom)):
+        files = [(label, path) for label, path in dictionary_files(name_data_path)
+                 if label in labels and os.path.exists(path)]
+        return cls(read_names(files))
+
+    def search(self, text, top_k=5, threshold=0.6, labels=None):
+        """Names with similarity to text of at least `threshold`, the most similar `top_k` first. """
+        if not text:
+            return []
+        grams = bigrams(text)
+        counts = {}
+        for gram in grams:
+            for no in self.postings.get(gram, ()):
+                counts[no] = counts.get(no, 0) + 1
+
+        results = []
+        for no, common in counts.items():
+            name = self.names[no]
+            length = max(len(text), len(name))
+            bound = int((1 - threshold) * length + 1e-9)
+            if common < len(grams) - 2 * bound or abs(len(text) - len(name)) > bound:
+                continue
+            if labels is not None and not set(labels).intersection(self.labels[no]):
+                continue
+            distance = bounded_distance(text, name, bound)
+            if distance <= bound:
+                results.append(FuzzyMatch(name, self.labels[no], 1 - distance / length))
+        results.sort(key=lambda m: (-m.similarity, m.name))
+        return results[:top_k]
+
+    def link(self, text, threshold=0.65, min_length=2, max_length=8, labels=None):
+        """Mentions of entities in text by fuzzy matching every span of `min_length` to `max_length`.
+
+        Spans are taken by similarity and then length, and overlapping spans are dropped.
+        """
+        candidates = []
+        for start in range(len(text)):
+            for end in range(start + min_length, min(start + max_length, len(text)) + 1):
+                for match in self.search(text[start:end], top_k=1, threshold=threshold, labels=labels):
+                    candidates.append((match.similarity, end - start, start, end, match))
+        candidates.sort(key=lambda c: (-c[0], -c[1], c[2]))
+
+        taken = [False] * len(text)
+        mentions = []
+        for _, _, start, end, match in candidates:
+            if not any(taken[start:end]):
+                taken[start:end] = [True] * (end - start)
+                mentions.append(Mention(start, end, match.name, match.labels))
+        mentions.sort()
+        return mentions
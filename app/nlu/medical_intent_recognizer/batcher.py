@@ -0,0 +1,96 @@
+"""
+@desc: Dynamic micro-batching of questions for the intent recognizer.
+"""
+import asyncio
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+
+class MicroBatcher(object):
+    """Collects questions from concurrent callers into batches for one forward pass each.
+
+    A background thread takes the first waiting question, then keeps taking questions until
+    the batch has `max_batch_size` of them or `max_wait` seconds have passed since the first
+    one arrived, runs `recognizer.predict` on the batch and resolves the future of every
+    caller. Callers in threads use `recognize` or `submit`, and callers in an event loop
+    await `recognize_async`.
+    """
+
+    def __init__(self, recognizer, max_batch_size=32, max_wait=0.005):
+        self.recognizer = recognizer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._closed = False
+        # held while checking `_closed` and queueing, so no question is queued after the sentinel
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="intent-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, question):
+        """Queue a question and return a `concurrent.futures.Future` of its intent. """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put((question, future))
+        return future
+
+    def recognize(self, question, timeout=None):
+        return self.submit(question).result(timeout)
+
+    async def recognize_async(self, question):
+        return await asyncio.wrap_future(self.submit(question))
+
+    def close(self):
+        """Stop taking questions, finish the queued ones and stop the background thread. """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _next_batch(self):
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # stop after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [(question, future) for question, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                intents = self.recognizer.predict([question for question, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), intent in zip(batch, intents):
+                    future.set_result(intent)
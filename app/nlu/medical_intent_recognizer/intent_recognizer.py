@@ -1,11 +1,190 @@
 """
 @author: Qinjuan Yang
 @time: 2022-03-29 00:03
-@desc: 
+@desc:
 """
+import bisect
+import csv
+import json
+import os
+
+import torch
+from torch import nn
+
+from app.nlu.medical_intent_recognizer.model import BertTextCNN, TextCNN
+from app.nlu.medical_intent_recognizer.tokenizer import WordPieceTokenizer
+from app.query import intent_plans
+
+data_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
+
+pad_token = "[PAD]"
+unk_token = "[UNK]"
+
+
+def read_dataset(file_path):
+    """Return (texts, label names, label ids) of a csv file like data/train.csv. """
+    texts, label_names, labels = [], [], []
+    with open(file_path, "r", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            texts.append(row["originalText"])
+            label_names.append(row["label_class"])
+            labels.append(int(row["label"]))
+    return texts, label_names, labels
+
+
+def build_vocab(texts):
+    """Character vocabulary, with padding as 0 and unknown characters as 1. """
+    vocab = {pad_token: 0, unk_token: 1}
+    for text in texts:
+        for char in text:
+            if char not in vocab:
+                vocab[char] = len(vocab)
+    return vocab
+
+
+def build_labels(label_names, labels):
+    """Names of intents ordered by their ids.
+
+    The id of an intent is its index in the sorted names of the 16 intents, which fills
+    the ids without examples in the dataset (there is none of 治疗时间).
+    """
+    names = dict(enumerate(sorted(intent_plans)))
+    names.update(zip(labels, label_names))
+    return [names[i] for i in range(max(names) + 1)]
+
+
+class IntentClassifier(nn.Module):
+    """Character embedding followed by TextCNN. """
+
+    def __init__(self, vocab_size, num_classes, embedding_dim=128, **kwargs):
+        super(IntentClassifier, self).__init__()
+        self.config = dict(kwargs, embedding_dim=embedding_dim)
+        self.embedding = nn.Embedding(vocab_size, embedding_dim, padding_idx=0)
+        self.text_cnn = TextCNN(embedding_dim, num_classes, **kwargs)
+
+    def forward(self, x, lengths=None):
+        return self.text_cnn(self.embedding(x), lengths)  # (batch, num_classes)
+
+
+# kind of model in a checkpoint -> class of the model
+model_classes = {"textcnn": IntentClassifier, "bert": BertTextCNN}
 
 
 class IntentRecognizer(object):
-    def __init__(self):
-        pass
+    # upper bounds of lengths of questions put into one forward pass, the last one is `max_length`
+    bucket_bounds = (8, 16, 32)
+
+    def __init__(self, model, vocab, labels, max_length, fixed_length=False, tokenizer=None, min_length=None):
+        """Questions longer than `max_length` tokens are truncated. With `fixed_length` every question
+        is padded to `max_length` as TextCNN used to require, otherwise questions are put into buckets
+        by length and padded to the longest one in their bucket.
+
+        Questions are split into characters of `vocab`, or by `tokenizer` like `WordPieceTokenizer`
+        for BertTextCNN. `min_length` defaults to the largest kernel of the TextCNN of `model`.
+        """
+        if fixed_length and tokenizer is not None:
+            raise ValueError("fixed_length is not supported with a tokenizer, BERT needs the lengths "
+                             "of questions for its attention mask")
+        self.model = model.eval()
+        self.vocab = vocab
+        self.labels = labels
+        self.max_length = max_length
+        self.fixed_length = fixed_length
+        self.tokenizer = tokenizer
+        self.min_length = min_length or max(model.text_cnn.kernel_size)
+
+    @classmethod
+    def from_dataset(cls, file_path=os.path.join(data_path, "train.csv"), max_length=64, **kwargs):
+        """Create a recognizer with vocabulary and intents of a dataset and an untrained model. """
+        texts, label_names, labels = read_dataset(file_path)
+        vocab = build_vocab(texts)
+        labels = build_labels(label_names, labels)
+        return cls(IntentClassifier(len(vocab), len(labels), **kwargs), vocab, labels, max_length)
+
+    @classmethod
+    def from_bert(cls, model_path, file_path=os.path.join(data_path, "train.csv"), max_length=64, **kwargs):
+        """Create a recognizer with intents of a dataset and BertTextCNN over a pretrained BERT. """
+        _, label_names, labels = read_dataset(file_path)
+        labels = build_labels(label_names, labels)
+        tokenizer = WordPieceTokenizer.from_file(os.path.join(model_path, "vocab.txt"))
+        return cls(BertTextCNN(model_path, len(labels), **kwargs), tokenizer.vocab, labels, max_length,
+                   tokenizer=tokenizer)
+
+    @classmethod
+    def load(cls, file_path):
+        checkpoint = torch.load(file_path, map_location="cpu")
+        # checkpoints saved before BertTextCNN could be saved have no kind
+        kind = checkpoint.get("model", "textcnn")
+        vocab, labels = checkpoint["vocab"], checkpoint["labels"]
+        if kind == "bert":
+            model = BertTextCNN(None, len(labels), **checkpoint["config"])
+        else:
+            model = IntentClassifier(len(vocab), len(labels), **checkpoint["config"])
+        model.load_state_dict(checkpoint["state_dict"])
+        tokenizer = WordPieceTokenizer(vocab) if kind == "bert" else None
+        return cls(model, vocab, labels, checkpoint["max_length"], tokenizer=tokenizer)
+
+    @classmethod
+    def load_exported(cls, file_path):
+        """Load a model exported by `export.export_recognizer`, which needs neither the classes of
+        the model nor transformers. """
+        extra_files = {"meta.json": ""}
+        model = torch.jit.load(file_path, map_location="cpu", _extra_files=extra_files)
+        meta = json.loads(extra_files["meta.json"])
+        tokenizer = WordPieceTokenizer(meta["vocab"]) if meta["tokenizer"] == "wordpiece" else None
+        return cls(model, meta["vocab"], meta["labels"], meta["max_length"], tokenizer=tokenizer,
+                   min_length=meta["min_length"])
+
+    def save(self, file_path):
+        kinds = [kind for kind, model_class in model_classes.items() if isinstance(self.model, model_class)]
+        if not kinds:
+            raise ValueError("A model of {} cannot be saved, an exported model is saved by "
+                             "export.export_recognizer".format(type(self.model).__name__))
+        torch.save({"model": kinds[0], "vocab": self.vocab, "labels": self.labels, "max_length": self.max_length,
+                    "config": self.model.config, "state_dict": self.model.state_dict()}, file_path)
+
+    def tokenize(self, question):
+        """Ids of tokens of a question, at most `max_length` of them. """
+        if self.tokenizer is not None:
+            return self.tokenizer.encode(question, self.max_length)
+        unk = self.vocab[unk_token]
+        return [self.vocab.get(c, unk) for c in question[:self.max_length]]
+
+    def encode(self, questions):
+        """Ids of tokens of questions and their lengths. """
+        return self.pad([self.tokenize(question) for question in questions])
+
+    def pad(self, rows):
+        """Pad ids of tokens to the longest of them, but not shorter than the largest kernel of
+        TextCNN, or to `max_length` if `fixed_length`. """
+        lengths = torch.tensor([len(row) for row in rows], dtype=torch.long)
+        width = self.max_length if self.fixed_length else max(max(lengths.tolist()), self.min_length)
+        ids = torch.zeros((len(rows), width), dtype=torch.long)
+        for no, row in enumerate(rows):
+            ids[no, :len(row)] = torch.tensor(row, dtype=torch.long)
+        return ids, lengths
+
+    def buckets(self, rows):
+        """Indexes of rows of tokens grouped by `bucket_bounds` of their lengths. """
+        if self.fixed_length:
+            return [list(range(len(rows)))]
+        buckets = {}
+        for no, row in enumerate(rows):
+            bucket = bisect.bisect_left(self.bucket_bounds, len(row))
+            buckets.setdefault(bucket, []).append(no)
+        return [buckets[bucket] for bucket in sorted(buckets)]
+
+    def predict(self, questions):
+        """Intents of a batch of questions with one forward pass for each bucket of lengths. """
+        rows = [self.tokenize(question) for question in questions]
+        intents = [None] * len(questions)
+        with torch.inference_mode():
+            for bucket in self.buckets(rows):
+                ids, lengths = self.pad([rows[no] for no in bucket])
+                logits = self.model(ids, None if self.fixed_length else lengths)
+                for no, label in zip(bucket, logits.argmax(dim=-1).tolist()):
+                    intents[no] = self.labels[label]
+        return intents
 
+    def recognize(self, question):
+        return self.predict([question])[0]
@@ -5,42 +5,66 @@
 """
 from torch import nn
 import torch
-from transformers import BertModel, BertForSequenceClassification
 
 
 class TextCNN(nn.Module):
     def __init__(self,
                  embedding_dim,
                  num_classes,
-                 max_length,
+                 max_length=None,
                  kernel_size=(3, 4, 5),
                  num_filers=100,
                  dropout=0.3):
+        """`max_length` is not needed anymore since features are max pooled over the actual length. """
         super(TextCNN, self).__init__()
+        self.kernel_size = tuple(kernel_size)
         self.convs = nn.ModuleList([
             nn.Sequential(nn.Conv2d(1, num_filers, (ks, embedding_dim)),
-                          nn.ReLU(),
-                          nn.MaxPool2d((max_length - ks + 1, 1)))
+                          nn.ReLU())
             for ks in kernel_size
         ])
         self.fc = nn.Linear(num_filers * len(kernel_size), num_classes)
         self.dropout = nn.Dropout(dropout)
 
-    def forward(self, x):
+    def forward(self, x, lengths=None):
+        """`x` is (batch, seq_len, embedding_dim) with seq_len >= max(kernel_size), and `lengths` are
+        the numbers of tokens before padding, or None to pool over the whole sequence. """
         x = x.unsqueeze(1)  # (batch, 1, seq_len, embedding_dim)
-        out = [conv(x) for conv in self.convs]  # each is (batch, num_filters, 1, 1)
-        out = torch.cat(out, dim=1)  # (batch, num_filers * len(kernel_size), 1, 1)
-        out = out.squeeze()  # (batch, num_filters * len(kernel_size))
+        out = []
+        for ks, conv in zip(self.kernel_size, self.convs):
+            feature = conv(x).squeeze(3)  # (batch, num_filters, seq_len - ks + 1)
+            if lengths is not None:
+                # windows running into padding are zeroed, which keeps the max as ReLU makes features >= 0;
+                # a sequence shorter than the kernel keeps its first window
+                positions = torch.arange(feature.size(2), device=feature.device)
+                valid = positions.unsqueeze(0) < (lengths - ks + 1).clamp(min=1).unsqueeze(1)  # (batch, windows)
+                feature = feature * valid.unsqueeze(1)
+            out.append(feature.max(dim=2).values)  # each is (batch, num_filters)
+        out = torch.cat(out, dim=1)  # (batch, num_filters * len(kernel_size))
         out = self.dropout(out)  # (batch, num_filters * len(kernel_size))
         logits = self.fc(out)  # (batch, num_classes)
         return logits
 
 
 class BertTextCNN(nn.Module):
-    def __init__(self, model_path):
+    def __init__(self, model_path, num_classes, bert_config=None, **kwargs):
+        """TextCNN over the last hidden states of a BERT model in `model_path`, or of an untrained
+        one of `bert_config`, a dict of `BertConfig`, whose weights are loaded from a checkpoint.
+        transformers is imported here, so it is only needed to build the model, not to run an
+        exported one. """
         super(BertTextCNN, self).__init__()
-        pass
+        from transformers import BertConfig, BertModel
+        if bert_config is None:
+            self.bert = BertModel.from_pretrained(model_path)
+        else:
+            self.bert = BertModel(BertConfig.from_dict(bert_config))
+        self.config = dict(kwargs, bert_config=self.bert.config.to_dict())
+        self.text_cnn = TextCNN(self.bert.config.hidden_size, num_classes, **kwargs)
 
-    def forward(self, x):
-        pass
-    
\ No newline at end of file
+    def forward(self, x, lengths):
+        """`x` is (batch, seq_len) token ids of [CLS] question [SEP] and `lengths` are their numbers
+        of tokens before padding. """
+        positions = torch.arange(x.size(1), device=x.device)
+        attention_mask = (positions.unsqueeze(0) < lengths.unsqueeze(1)).long()  # (batch, seq_len)
+        hidden = self.bert(input_ids=x, attention_mask=attention_mask)[0]  # (batch, seq_len, hidden_size)
+        return self.text_cnn(hidden, lengths)  # (batch, num_classes)
@@ -0,0 +1,86 @@
+"""
+@desc: WordPiece tokenizer of BERT, so an exported BertTextCNN runs without transformers.
+"""
+import unicodedata
+
+cls_token = "[CLS]"
+sep_token = "[SEP]"
+unk_token = "[UNK]"
+
+
+def read_vocab(file_path):
+    """Token -> id of a vocab.txt of BERT. """
+    with open(file_path, "r", encoding="utf-8") as file:
+        return {line.rstrip("\n"): no for no, line in enumerate(file)}
+
+
+def is_chinese_char(cp):
+    return 0x4E00 <= cp <= 0x9FFF or 0x3400 <= cp <= 0x4DBF or 0x20000 <= cp <= 0x2A6DF or \
+        0x2A700 <= cp <= 0x2B73F or 0x2B740 <= cp <= 0x2B81F or 0x2B820 <= cp <= 0x2CEAF or \
+        0xF900 <= cp <= 0xFAFF or 0x2F800 <= cp <= 0x2FA1F
+
+
+def is_punctuation(char):
+    cp = ord(char)
+    if 33 <= cp <= 47 or 58 <= cp <= 64 or 91 <= cp <= 96 or 123 <= cp <= 126:
+        return True
+    return unicodedata.category(char).startswith("P")
+
+
+class WordPieceTokenizer(object):
+    """Same tokens as BertTokenizer of transformers with the default options: text is lower
+    cased without accents, split on whitespace, punctuation and every Chinese character, and
+    each word is split greedily into the longest pieces found in the vocabulary. """
+
+    def __init__(self, vocab, max_chars_per_word=100):
+        self.vocab = vocab
+        self.max_chars_per_word = max_chars_per_word
+
+    @classmethod
+    def from_file(cls, file_path):
+        return cls(read_vocab(file_path))
+
+    def words(self, text):
+        text = unicodedata.normalize("NFD", text.lower())
+        words, word = [], []
+        for char in text:
+            cp = ord(char)
+            category = unicodedata.category(char)
+            if cp == 0 or cp == 0xFFFD or category == "Mn" or category.startswith("C") and char not in "\t\n\r":
+                continue  # control characters and accents
+            if char in " \t\n\r" or category == "Zs":
+                words.append(word)
+                word = []
+            elif is_chinese_char(cp) or is_punctuation(char):
+                words.extend([word, [char]])
+                word = []
+            else:
+                word.append(char)
+        words.append(word)
+        return ["".join(word) for word in words if word]
+
+    def pieces(self, word):
+        if len(word) > self.max_chars_per_word:
+            return [unk_token]
+        pieces, start = [], 0
+        while start < len(word):
+            end = len(word)
+            while end > start:
+                piece = word[start:end] if start == 0 else "##" + word[start:end]
+                if piece in self.vocab:
+                    break
+                end -= 1
+            if end == start:
+                return [unk_token]
+            pieces.append(piece)
+            start = end
+        return pieces
+
+    def tokenize(self, text):
+        return [piece for word in self.words(text) for piece in self.pieces(word)]
+
+    def encode(self, text, max_length):
+        """Ids of [CLS] tokens [SEP], with tokens truncated to fit in `max_length`. """
+        unk = self.vocab[unk_token]
+        ids = [self.vocab.get(token, unk) for token in self.tokenize(text)[:max_length - 2]]
+        return [self.vocab[cls_token]] + ids + [self.vocab[sep_token]]
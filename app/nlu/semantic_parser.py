@@ -0,0 +1,29 @@
+"""
+@desc: Semantic parser turning a question into a query of its intent and the entities in it.
+"""
+from app.query import Query
+from app.utils.metrics import metrics
+
+
+class SemanticParser(object):
+    def __init__(self, intent_recognizer, entity_linker, fuzzy_matcher=None):
+        self.intent_recognizer = intent_recognizer
+        self.entity_linker = entity_linker  # app.nlu.entity_linker.EntityLinker
+        self.fuzzy_matcher = fuzzy_matcher  # app.nlu.fuzzy_matcher.FuzzyMatcher, tried if no name matches exactly
+
+    def link_entities(self, question):
+        """(type, name) of entities in question, a name of several types gives one for each type. """
+        mentions = self.entity_linker.link(question)
+        if not mentions and self.fuzzy_matcher is not None:
+            mentions = self.fuzzy_matcher.link(question)
+        return [(label, mention.name) for mention in mentions for label in mention.labels]
+
+    def parse(self, question):
+        """Return the `Query` of a question, or None if no entity is found in it. """
+        with metrics.stage("entity_linking"):
+            entities = self.link_entities(question)
+        if not entities:
+            return None
+        with metrics.stage("intent_recognition"):
+            intent = self.intent_recognizer.recognize(question)
+        return Query(intent, entities)
@@ -0,0 +1,4 @@
+"""
+@desc: Execution of parsed questions against the knowledge graph.
+"""
+from app.query.base import Fact, Query, QueryBackend, QueryEngine, intent_plans
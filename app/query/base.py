@@ -0,0 +1,152 @@
+"""
+@desc: Queries of the intents of questions and the interface of backends executing them.
+"""
+from collections import namedtuple
+
+from app.kg.schema import (entity_type_check, entity_type_department, entity_type_disease, entity_type_drug,
+                           entity_type_symptom, rels_type_advise_eat, rels_type_avoid_eat,
+                           rels_type_belongs_to, rels_type_common_drug, rels_type_has_complication,
+                           rels_type_has_symptom, rels_type_need_check, rels_type_recommend_drug,
+                           rels_type_treat_department, rels_type_treatment_method)
+from app.utils.metrics import metrics
+
+intent_treatment = "治疗方法"
+intent_definition = "定义"
+intent_clinical_manifestation = "临床表现(病症表现)"
+intent_indication = "适用症"
+intent_related_disease = "相关病症"
+intent_cause = "病因"
+intent_check = "化验/体检方案"
+intent_cure_rate = "治愈率"
+intent_method = "方法"
+intent_infectivity = "传染性"
+intent_prevention = "预防"
+intent_cost = "费用"
+intent_department = "所属科室"
+intent_treatment_time = "治疗时间"
+intent_taboo = "病症禁忌"
+intent_other = "其他"
+
+step_attribute = "attribute"
+step_relationship = "relationship"
+
+
+def _attr(name):
+    return step_attribute, name, False
+
+
+def _rel(rel_type, reverse=False):
+    return step_relationship, rel_type, reverse
+
+
+# intent -> type of entity in question -> steps of (kind, attribute or relationship type, reverse)
+intent_plans = {
+    intent_treatment: {
+        entity_type_disease: [_rel(rels_type_treatment_method), _rel(rels_type_common_drug),
+                              _rel(rels_type_recommend_drug)],
+    },
+    intent_definition: {
+        entity_type_disease: [_attr("desc")],
+    },
+    intent_clinical_manifestation: {
+        entity_type_disease: [_rel(rels_type_has_symptom)],
+    },
+    intent_indication: {
+        entity_type_drug: [_rel(rels_type_common_drug, True), _rel(rels_type_recommend_drug, True)],
+        entity_type_check: [_rel(rels_type_need_check, True)],
+    },
+    intent_related_disease: {
+        entity_type_disease: [_rel(rels_type_has_complication), _rel(rels_type_has_complication, True)],
+        entity_type_symptom: [_rel(rels_type_has_symptom, True)],
+    },
+    intent_cause: {
+        entity_type_disease: [_attr("cause")],
+    },
+    intent_check: {
+        entity_type_disease: [_rel(rels_type_need_check)],
+    },
+    intent_cure_rate: {
+        entity_type_disease: [_attr("cure_rate")],
+    },
+    intent_method: {
+        entity_type_disease: [_rel(rels_type_treatment_method)],
+    },
+    intent_infectivity: {
+        entity_type_disease: [_attr("infection_mode")],
+    },
+    intent_prevention: {
+        entity_type_disease: [_attr("prevent")],
+    },
+    intent_cost: {
+        entity_type_disease: [_attr("treatment_cost")],
+    },
+    intent_department: {
+        entity_type_disease: [_rel(rels_type_treat_department)],
+        entity_type_department: [_rel(rels_type_belongs_to)],
+    },
+    intent_treatment_time: {
+        entity_type_disease: [_attr("treatment_cycle")],
+    },
+    intent_taboo: {
+        entity_type_disease: [_rel(rels_type_avoid_eat), _rel(rels_type_advise_eat)],
+    },
+    intent_other: {},
+}
+
+
+class Query(object):
+    """A parsed question: its intent and the (type, name) of entities mentioned in it. """
+
+    def __init__(self, intent, entities):
+        self.intent = intent
+        self.entities = list(entities)
+
+    def steps(self):
+        """(type, name, step) to look up for answering the question, see `intent_plans`. """
+        plans = intent_plans.get(self.intent, {})
+        return [(label, name, step) for label, name in self.entities for step in plans.get(label, [])]
+
+    def __eq__(self, other):
+        return isinstance(other, Query) and (self.intent, self.entities) == (other.intent, other.entities)
+
+    def __hash__(self):
+        return hash((self.intent, tuple(self.entities)))
+
+    def __repr__(self):
+        return "Query({!r}, {!r})".format(self.intent, self.entities)
+
+
+# the value of an attribute, or names of entities related by relationship, of an entity in question
+Fact = namedtuple("Fact", ["label", "name", "kind", "key", "reverse", "values"])
+
+
+class QueryBackend(object):
+    """Looks up the steps of queries in a graph. """
+
+    def lookup(self, steps):
+        """Return a list of values for each of (type, name, step), empty if not found. """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class QueryEngine(object):
+    def __init__(self, backend):
+        self.backend = backend
+
+    def execute(self, query):
+        return self.execute_many([query])[0]
+
+    def execute_many(self, queries):
+        """Answer queries with one lookup on the backend, return a list of facts for each query. """
+        with metrics.stage("query_building"):
+            steps = [query.steps() for query in queries]
+        with metrics.stage("graph_lookup"):
+            values = iter(self.backend.lookup([step for query_steps in steps for step in query_steps]))
+        return [[Fact(label, name, kind, key, reverse, next(values))
+                 for label, name, (kind, key, reverse) in query_steps]
+                for query_steps in steps]
+
+    def close(self):
+        self.backend.close()
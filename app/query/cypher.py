@@ -0,0 +1,68 @@
+"""
+@desc: Backend answering queries with batched Cypher through a pooled neo4j driver.
+"""
+from app.query.base import QueryBackend, step_attribute
+
+
+def create_driver(uri, user, password, pool_size=50):
+    """Create a neo4j driver, which keeps a pool of at most `pool_size` connections. """
+    from neo4j import GraphDatabase
+
+    return GraphDatabase.driver(uri, auth=(user, password), max_connection_pool_size=pool_size)
+
+
+def attribute_statement(label, attributes):
+    return "UNWIND $names AS name MATCH (n:{} {{name: name}}) RETURN name, n {{{}}} AS props".format(
+        label, ", ".join("." + attr for attr in attributes))
+
+
+def relationship_statement(label, rel_type, reverse):
+    pattern = "<-[:{}]-" if reverse else "-[:{}]->"
+    return ("UNWIND $names AS name MATCH (n:{} {{name: name}})" + pattern.format(rel_type) +
+            "(m) RETURN name, collect(m.name) AS names").format(label)
+
+
+class CypherBackend(QueryBackend):
+    """Looks up the steps of a batch of queries with one statement per (type, step).
+
+    Names of all the entities sharing a step are sent as one list parameter and expanded
+    with UNWIND, and the attributes of a type of entity are fetched by one statement, so
+    the number of round trips does not grow with the number of queries in the batch.
+    """
+
+    def __init__(self, driver, database=None):
+        self.driver = driver
+        self.database = database
+
+    def lookup(self, steps):
+        attributes = {}  # type -> names of attributes
+        relationships = set()  # (type, relationship type, reverse)
+        names = {}  # (type, attributes) or (type, relationship type, reverse) -> names of entities
+        for label, name, (kind, key, reverse) in steps:
+            if kind == step_attribute:
+                attributes.setdefault(label, set()).add(key)
+                names.setdefault((label, None), set()).add(name)
+            else:
+                relationships.add((label, key, reverse))
+                names.setdefault((label, key, reverse), set()).add(name)
+
+        found = {}  # (type, name, step key) -> values
+        kwargs = {"database": self.database} if self.database else {}
+        with self.driver.session(**kwargs) as session:
+            for label, attrs in attributes.items():
+                attrs = sorted(attrs)
+                records = session.run(attribute_statement(label, attrs), {"names": sorted(names[label, None])})
+                for record in records:
+                    props = record["props"] or {}
+                    for attr in attrs:
+                        found[label, record["name"], attr, False] = [props[attr]] if props.get(attr) else []
+            for label, rel_type, reverse in sorted(relationships):
+                records = session.run(relationship_statement(label, rel_type, reverse),
+                                      {"names": sorted(names[label, rel_type, reverse])})
+                for record in records:
+                    found[label, record["name"], rel_type, reverse] = list(record["names"])
+
+        return [found.get((label, name, key, reverse), []) for label, name, (_, key, reverse) in steps]
+
+    def close(self):
+        self.driver.close()
@@ -0,0 +1,41 @@
+"""
+@desc: Backend answering queries in process from a snapshot of the graph.
+"""
+from app.kg.snapshot import GraphSnapshot
+from app.query.base import QueryBackend, step_attribute
+
+
+class LocalBackend(QueryBackend):
+    """Looks up names and adjacency in a memory-mapped `GraphSnapshot`. """
+
+    def __init__(self, snapshot):
+        self.snapshot = GraphSnapshot(snapshot) if isinstance(snapshot, str) else snapshot
+
+    def load(self, snapshot):
+        """Switch to another build of the graph. The old snapshot is not closed, as lookups
+        running in other threads may still read it, it is unmapped once the last of them is done. """
+        self.snapshot = GraphSnapshot(snapshot) if isinstance(snapshot, str) else snapshot
+
+    @property
+    def build_version(self):
+        return self.snapshot.build_version
+
+    def lookup(self, steps):
+        snapshot = self.snapshot
+        nodes = {}
+        results = []
+        for label, name, (kind, key, reverse) in steps:
+            if (label, name) not in nodes:
+                nodes[label, name] = snapshot.find(label, name)
+            node = nodes[label, name]
+            if node is None:
+                results.append([])
+            elif kind == step_attribute:
+                value = snapshot.attribute(node, key)
+                results.append([value] if value else [])
+            else:
+                results.append([snapshot.name_of(n) for n in snapshot.neighbors(key, node, reverse).tolist()])
+        return results
+
+    def close(self):
+        self.snapshot.close()
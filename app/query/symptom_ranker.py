@@ -0,0 +1,93 @@
+"""
+@desc: Ranking diseases by a set of symptoms with a sparse disease x symptom matrix.
+"""
+import numpy as np
+from scipy import sparse
+
+from app.kg.schema import entity_type_disease, entity_type_symptom, rels_type_has_symptom
+
+
+class SymptomRanker(object):
+    """Scores every disease for a set of symptoms with one sparse matrix-vector product.
+
+    A symptom is weighted by idf = log(1 + number of diseases / number of diseases having
+    it), and the rows of diseases and the symptom vector of the question are normalized to
+    unit length, so the score is the cosine similarity of the binary symptom vector of the
+    question and the idf weighted symptom vector of the disease, at most 1. Rare symptoms count more than common ones, and a
+    disease with many symptoms is not favoured just for having more of them.
+    """
+
+    def __init__(self, disease_names, symptom_names, diseases, symptoms):
+        """Build the matrix from the (disease, symptom) index pairs of HAS_SYMPTOM. """
+        self.disease_names = list(disease_names)
+        self.symptom_names = list(symptom_names)
+        self.symptom_index = {name: no for no, name in enumerate(self.symptom_names)}
+
+        num_diseases, num_symptoms = len(self.disease_names), len(self.symptom_names)
+        incidence = sparse.csr_matrix((np.ones(len(diseases), dtype=np.float32), (diseases, symptoms)),
+                                      shape=(num_diseases, num_symptoms))
+        incidence.sum_duplicates()
+        incidence.data[:] = 1
+        df = np.bincount(incidence.indices, minlength=num_symptoms)
+        idf = np.log1p(num_diseases / np.maximum(df, 1)).astype(np.float32)
+        weights = incidence.multiply(idf[np.newaxis, :]).tocsr()
+        norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        self.matrix = sparse.csr_matrix(sparse.diags(1 / norms).dot(weights), dtype=np.float32)
+        # symptom x disease, so a query only touches the rows of its symptoms
+        self._by_symptom = self.matrix.T.tocsr()
+
+    @classmethod
+    def from_store(cls, store):
+        """Build from a `GraphStore` after deduplication. """
+        disease_ids = store.entity_ids(entity_type_disease)
+        symptom_ids = store.entity_ids(entity_type_symptom)
+        edges = store.edges(rels_type_has_symptom)
+        return cls([store.name_of(i) for i in disease_ids.tolist()],
+                   [store.name_of(i) for i in symptom_ids.tolist()],
+                   np.searchsorted(disease_ids, edges[:, 0]),
+                   np.searchsorted(symptom_ids, edges[:, 1]))
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Build from the HAS_SYMPTOM adjacency of a `GraphSnapshot`. """
+        disease_start, disease_stop = snapshot.label_ranges[entity_type_disease]
+        symptom_start, symptom_stop = snapshot.label_ranges[entity_type_symptom]
+        offsets, targets = snapshot.adjacency(rels_type_has_symptom)
+        diseases = np.repeat(np.arange(disease_stop - disease_start), np.diff(offsets))
+        return cls([snapshot.name_of(n) for n in range(disease_start, disease_stop)],
+                   [snapshot.name_of(n) for n in range(symptom_start, symptom_stop)],
+                   diseases, targets - symptom_start)
+
+    def _query_matrix(self, symptom_sets):
+        rows, cols, values = [], [], []
+        for row, symptoms in enumerate(symptom_sets):
+            known = {self.symptom_index[s] for s in symptoms if s in self.symptom_index}
+            for col in known:
+                rows.append(row)
+                cols.append(col)
+                values.append(1 / np.sqrt(len(known)))
+        return sparse.csr_matrix((np.array(values, dtype=np.float32), (rows, cols)),
+                                 shape=(len(symptom_sets), len(self.symptom_names)))
+
+    def _top_k(self, diseases, scores, top_k):
+        if len(scores) > top_k:
+            # every disease scoring at least the k-th score, so ties at the cut are broken by
+            # index below and not by the order argpartition happens to leave them in
+            keep = scores >= np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+            diseases, scores = diseases[keep], scores[keep]
+        order = np.lexsort((diseases, -scores))[:top_k]
+        return [(self.disease_names[d], float(s)) for d, s in zip(diseases[order], scores[order])]
+
+    def rank(self, symptoms, top_k=10):
+        """The `top_k` (disease, score) for a set of symptom names, unknown symptoms are ignored. """
+        return self.rank_batch([symptoms], top_k)[0]
+
+    def rank_batch(self, symptom_sets, top_k=10):
+        """Rank diseases for several sets of symptoms with one sparse matrix product. """
+        scores = sparse.csr_matrix(self._query_matrix(symptom_sets).dot(self._by_symptom))
+        results = []
+        for row in range(len(symptom_sets)):
+            begin, end = scores.indptr[row], scores.indptr[row + 1]
+            results.append(self._top_k(scores.indices[begin:end], scores.data[begin:end], top_k))
+        return results
@@ -0,0 +1,58 @@
+"""
+@desc: Thread-safe LRU cache with expiry and hit/miss counters.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+
+class LRUCache(object):
+    """Keeps at most `max_size` entries, dropping the least recently used one first. An entry
+    older than `ttl` seconds is treated as missing, no expiry if `ttl` is None. """
+
+    def __init__(self, max_size=10000, ttl=None, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()  # key -> (time to expire, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            expire = None if self.ttl is None else self.clock() + self.ttl
+            self._entries[key] = (expire, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions, "expirations": self.expirations}
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,36 @@
+"""
+@desc: Objects created on first use.
+"""
+import threading
+
+
+class Lazy(object):
+    """Stands for the object returned by `factory`, which is called on first attribute access,
+    or by `get`, once even if several threads get it at the same time. """
+
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self._name = name or getattr(factory, "__name__", "object")
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._value = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self._factory()
+                    self._loaded = True
+        return self._value
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def __repr__(self):
+        return "Lazy({}, loaded={})".format(self._name, self._loaded)
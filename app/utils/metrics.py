@@ -0,0 +1,202 @@
+"""
+@desc: In-process timing spans, latency histograms and counters with a Prometheus text dump.
+
+Everything is recorded in the `metrics` registry of this module, which is disabled unless
+KBQA_METRICS=1 or `metrics.enable()` is called. When disabled, `span` returns a shared
+object doing nothing, so an instrumented stage costs one attribute check.
+"""
+import bisect
+import math
+import os
+import threading
+import time
+
+# latency of a stage of answering a question, labeled by stage
+stage_seconds = "kbqa_stage_seconds"
+# latency of answering a question, labeled by intent
+answer_seconds = "kbqa_answer_seconds"
+
+quantiles = (0.5, 0.95, 0.99)
+
+# upper bounds of histogram buckets, 20 a decade from 1us to 1000s, so a percentile is
+# reported within 12% of its value
+bucket_bounds = [1e-6 * 10 ** (i / 20) for i in range(181)]
+
+
+class Histogram(object):
+    def __init__(self):
+        self.counts = [0] * (len(bucket_bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(bucket_bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile, not more than the max. """
+        if not self.count:
+            return 0.0
+        rank = max(int(math.ceil(p / 100 * self.count)), 1)
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bucket_bounds[bucket], self.max) if bucket < len(bucket_bounds) else self.max
+        return self.max
+
+
+class Span(object):
+    """Times a `with` block into a histogram, labels can be added inside the block. """
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.start = None
+
+    def label(self, **labels):
+        self.labels.update(labels)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+class NullSpan(object):
+    def label(self, **labels):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+null_span = NullSpan()
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    escaped = [(k, str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")) for k, v in items]
+    return "{" + ",".join("{}=\"{}\"".format(k, v) for k, v in escaped) + "}"
+
+
+class Metrics(object):
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms = {}  # name -> {label key: Histogram}
+        self._counters = {}  # name -> {label key: value}
+        self._gauges = {}  # name -> {label key: value}
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def span(self, name, **labels):
+        """`with metrics.span(name, **labels):` records the seconds of the block. """
+        if not self.enabled:
+            return null_span
+        return Span(self, name, labels)
+
+    def stage(self, stage):
+        return self.span(stage_seconds, stage=stage) if self.enabled else null_span
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = label_key(labels)
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = label_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges.setdefault(name, {})[label_key(labels)] = value
+
+    def value(self, name, **labels):
+        """Current value of a counter or gauge, 0 if never recorded. """
+        key = label_key(labels)
+        with self._lock:
+            if name in self._gauges:
+                return self._gauges[name].get(key, 0)
+            return self._counters.get(name, {}).get(key, 0)
+
+    def percentiles(self, name, **labels):
+        """{p: seconds} of the p50, p95 and p99 of a histogram, None if never recorded. """
+        with self._lock:
+            histogram = self._histograms.get(name, {}).get(label_key(labels))
+            if histogram is None:
+                return None
+            return {int(q * 100): histogram.percentile(q * 100) for q in quantiles}
+
+    def summary(self):
+        """{name: {labels: {"count", "mean", "p50", "p95", "p99", "max"}}} of every histogram. """
+        with self._lock:
+            result = {}
+            for name, series in self._histograms.items():
+                result[name] = {}
+                for key, histogram in series.items():
+                    item = {"count": histogram.count, "mean": histogram.sum / histogram.count, "max": histogram.max}
+                    item.update(("p{}".format(int(q * 100)), histogram.percentile(q * 100)) for q in quantiles)
+                    result[name][key] = item
+            return result
+
+    def prometheus(self):
+        """Every metric in Prometheus text format, histograms as summaries with quantiles. """
+        lines = []
+        with self._lock:
+            for name in sorted(self._histograms):
+                lines.append("# TYPE {} summary".format(name))
+                for key, histogram in sorted(self._histograms[name].items()):
+                    for q in quantiles:
+                        lines.append("{}{} {!r}".format(name, format_labels(key, [("quantile", q)]),
+                                                        histogram.percentile(q * 100)))
+                    lines.append("{}_sum{} {!r}".format(name, format_labels(key), histogram.sum))
+                    lines.append("{}_count{} {}".format(name, format_labels(key), histogram.count))
+            for kind, metrics in [("counter", self._counters), ("gauge", self._gauges)]:
+                for name in sorted(metrics):
+                    lines.append("# TYPE {} {}".format(name, kind))
+                    for key, value in sorted(metrics[name].items()):
+                        lines.append("{}{} {!r}".format(name, format_labels(key), value))
+        return "\n".join(lines) + "\n"
+
+    def dump(self, file_path):
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(self.prometheus())
+        os.replace(tmp_path, file_path)
+
+
+metrics = Metrics(enabled=os.environ.get("KBQA_METRICS") == "1")
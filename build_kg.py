@@ -3,351 +3,476 @@
 @time: 2022-03-22 00:17
 @desc: 
 """
+import argparse
+import hashlib
 import json
+import multiprocessing
 import os
 import re
+import time
 
 from tqdm import tqdm
-import pandas as pd
-
-
-entity_type_disease = "Disease"
-entity_type_symptom = "Symptom"
-entity_type_drug = "Drug"
-entity_type_check = "Check"
-entity_type_department = "Department"
-entity_type_food = "Food"
-entity_type_recipe = "Recipe"
-entity_type_pharm_company = "PharmCompany"
-entity_type_treatment = "Treatment"
-
-rels_type_recommend_drug = "RECOMMEND_DRUG"
-rels_type_recommend_recipe = "RECOMMEND_RECIPE"
-rels_type_avoid_eat = "AVOID_EAT"
-rels_type_advise_eat = "ADVISE_EAT"
-rels_type_has_symptom = "HAS_SYMPTOM"
-rels_type_has_complication = "HAS_COMPLICATION"
-rels_type_common_drug = "COMMON_DRUG"
-rels_type_need_check = "NEED_CHECK"
-rels_type_treat_department = "TREAT_DEPARTMENT"
-rels_type_belongs_to = "BELONGS_TO"
-rels_type_produce_drug = "PRODUCE_DRUG"
-rels_type_treatment_method = "TREATMENT_METHOD"
+
+from app.bundle import write_bundle
+from app.kg.bulk_loader import BulkLoader
+from app.kg.schema import (disease_attributes, entity_type_check, entity_type_department, entity_type_disease,
+                           entity_type_drug, entity_type_food, entity_type_pharm_company, entity_type_recipe,
+                           entity_type_symptom, entity_type_treatment, entity_types, relationship_types,
+                           rels_type_advise_eat, rels_type_avoid_eat, rels_type_belongs_to,
+                           rels_type_common_drug, rels_type_has_complication, rels_type_has_symptom,
+                           rels_type_need_check, rels_type_produce_drug, rels_type_recommend_drug,
+                           rels_type_recommend_recipe, rels_type_treat_department, rels_type_treatment_method)
+from app.kg.exporter import run_concurrently, write_edges, write_nodes
+from app.kg.incremental import IncrementalState
+from app.kg.snapshot import write_snapshot
+from app.kg.store import GraphStore
+from app.utils.metrics import metrics
 
 
 data_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "data")
 
+drug_detail_pattern = re.compile(r"(?P<company>\w+)\((?P<drug>\w+)\)")
+# keys of the source record holding lists of related entities
+list_fields = ("recommand_drug", "recommand_eat", "not_eat", "do_eat", "symptom", "acompany",
+               "common_drug", "check", "cure_department", "cure_way")
+
+
+def parse_record(line):
+    """Parse one line of medical.json.
+
+    Return a tuple of (disease, disease_dict, data), where `data` only keeps the fields
+    used to build relationships and `drug_detail` has been parsed into (company, drug)
+    pairs, or None if the name of disease is missing. The record is picklable, so it can
+    be sent back from a worker process.
+    """
+    raw = json.loads(line)
+    disease = raw.get("name")
+    if not disease:
+        return None
+
+    disease_dict = {
+        "name": disease,
+        "desc": raw.get("desc"),
+        "prevent": raw.get("prevent"),
+        "cause": raw.get("cause"),
+        "susceptible_populations": raw.get("easy_get"),
+        "treatment_cycle": raw.get("cure_lasttime"),
+        "cure_rate": raw.get("cured_prob"),
+        "treatment_cost": raw.get("cost_money"),
+        "is_healthcare_disease": raw.get("yibao_status"),
+        "prevalence_ratio": raw.get("get_prob"),
+        "infection_mode": raw.get("get_way")
+    }
+
+    data = {key: raw[key] for key in list_fields if key in raw}
+    if "drug_detail" in raw:
+        data["drug_detail"] = []
+        for item in raw["drug_detail"]:
+            res = drug_detail_pattern.match(item)
+            if res:
+                drug = res.group("drug")
+                company = res.group("company").replace(drug, "")
+                data["drug_detail"].append((company, drug))
+
+    return disease, disease_dict, data
+
+
+def split_shards(file_path, file_size, num_shards):
+    """Split file into `num_shards` byte ranges of about the same size.
+
+    A line belongs to the shard in which its first byte lies, see `extract_shard`.
+    """
+    bounds = [file_size * i // num_shards for i in range(num_shards + 1)]
+    return [(file_path, start, end) for start, end in zip(bounds[:-1], bounds[1:]) if start < end]
+
+
+def extract_shard(shard):
+    """Parse all the lines starting within byte range [start, end) of file. """
+    file_path, start, end = shard
+    records = []
+    with open(file_path, "rb") as file:
+        if start > 0:
+            # skip the line started in the previous shard
+            file.seek(start - 1)
+            file.readline()
+        pos = file.tell()
+        while pos < end:
+            line = file.readline()
+            if not line:
+                break
+            pos += len(line)
+            records.append(parse_record(line))
+    return records
+
 
 class DiseaseGraphExtractor(object):
-    def __init__(self):
-
-        self.global_identity = 1
-
-        # 8 types of entities
-        self.ent_disease = {}  # key is name, and value is detail of disease
-        self.ent_symptom = {}
-        self.ent_drug = {}
-        self.ent_check = {}
-        self.ent_department = {}
-        self.ent_food = {}
-        self.ent_recipe = {}
-        self.ent_pharm_company = {}  # pharmaceutical company
-        self.ent_treatment = {}
-
-        # 12 types of relationships
-        self.rels_department = []  # what department that a department belongs to, (department, belongs_to, department)
-        self.rels_avoid_eat = []  # avoid eating certain food for disease, (disease, avoid_eat, food)
-        self.rels_advise_eat = []  # advise eating certain food for disease, (disease, advise_eat, food)
-        self.rels_recommend_recipe = []  # recommended recipe for disease, (disease, recommend_recipe, recipe)
-        self.rels_common_drug = []  # commonly used drug for disease, (disease, common_drug, drug)
-        self.rels_recommend_drug = []  # recommend drug for disease, (disease, recommend_drug, drug)
-        self.rels_need_check = []  # check need to be taken for disease, (disease, need_check, check)
-        self.rels_produce_drug = []  # drug the pharmaceutical company produce, (pharmaceutical company, produce_drug, drug)
-        self.rels_complication = []  # complications of disease, (disease, has_complication, disease)
-        self.rels_symptom = []  # symptom the disease has, (disease, has_symptom, symptom)
-        self.rels_treat_department = []  # department to treat disease, (disease, treat_department, department)
-        self.rels_treatment_method = []  # treatment methods for disease, (disease, treatment_method, treatment)
-
-    def extract(self, file_path):
-        """Extract triples from file and export to database or file in batches. """
-        num_lines = sum([1 for _ in open(file_path, "r")])
-        print("Extracting triples from file {} with {} diseases.".format(file_path, num_lines))
-        with open(file_path, "r") as file:
-            for no, line in tqdm(enumerate(file), total=num_lines):
-                data = json.loads(line)
-                disease = data.get("name")
-                if not disease:
-                    print("Error: The name of disease is not found for line {}!".format(no))
+    def __init__(self, output_path=data_path):
+        # directory the csv files, snapshot and name lists are exported to
+        self.output_path = output_path
+        # names, relationships and properties of disease of 9 types of entities and 12 types of relationships
+        self.store = GraphStore()
+        # ids of entities still referred by records after an incremental build, None for all
+        self.alive_ids = None
+
+    def extract(self, file_path, num_workers=1, num_shards=None):
+        """Extract triples from file and export to database or file in batches.
+
+        With `num_workers` > 1 the file is split into byte-range shards which
+        are parsed in a process pool; the parsed records are then merged in
+        file order, so entities get exactly the same ids as in a sequential run.
+        """
+        start = time.perf_counter()
+        file_size = os.path.getsize(file_path)
+        print("Extracting triples from file {} ({} bytes).".format(file_path, file_size))
+        progress = tqdm(total=file_size, unit="B", unit_scale=True)
+        if num_workers > 1:
+            records = self._parse_parallel(file_path, file_size, num_workers,
+                                           num_shards or num_workers * 4, progress)
+        else:
+            records = self._parse_sequential(file_path, progress)
+
+        num_lines = 0
+        for no, record in enumerate(records):
+            num_lines += 1
+            if record is None:
+                print("Error: The name of disease is not found for line {}!".format(no))
+                continue
+            self.add_record(record)
+        progress.close()
+
+        self.finalize()
+        self.record_extraction("extract", num_lines, file_size, self.store.num_entities(),
+                               time.perf_counter() - start)
+
+    def extract_incremental(self, file_path, state_path):
+        """Extract only the records that are new or changed since the last incremental build.
+
+        The state of the last build is loaded from `state_path` and saved back afterwards.
+        Return a `Delta` with the entities and relationships added and removed; the store
+        holds every entity ever seen, with properties of the diseases in the delta.
+        """
+        start = time.perf_counter()
+        state = IncrementalState.load(state_path)
+        self.store = state.restore_store()
+
+        file_size = os.path.getsize(file_path)
+        print("Extracting changed triples from file {} ({} bytes) against build {}.".format(
+            file_path, file_size, state.version))
+        seen = set()
+        added = {}
+        num_lines = 0
+        with open(file_path, "rb") as file, tqdm(total=file_size, unit="B", unit_scale=True) as progress:
+            for no, line in enumerate(file):
+                num_lines += 1
+                progress.update(len(line))
+                key = hashlib.sha1(line.rstrip()).hexdigest()
+                if key in seen:
+                    continue
+                seen.add(key)
+                if key in state.records:
                     continue
 
-                disease_dict = {
-                    "name": disease,
-                    "desc": data.get("desc"),
-                    "prevent": data.get("prevent"),
-                    "cause": data.get("cause"),
-                    "susceptible_populations": data.get("easy_get"),
-                    "treatment_cycle": data.get("cure_lasttime"),
-                    "cure_rate": data.get("cured_prob"),
-                    "treatment_cost": data.get("cost_money"),
-                    "is_healthcare_disease": data.get("yibao_status"),
-                    "prevalence_ratio": data.get("get_prob"),
-                    "infection_mode": data.get("get_way")
-                }
-
-                if disease not in self.ent_disease:
-                    disease_dict.update({"id": self.global_identity})
-                    self.global_identity += 1
-                    self.ent_disease[disease] = disease_dict
-
-                if "recommand_drug" in data:
-                    for drug in data["recommand_drug"]:
-                        if drug not in self.ent_drug:
-                            self.ent_drug[drug] = {"name": drug, "id": self.global_identity}
-                            self.global_identity += 1
-                        self.rels_recommend_drug.append((self.ent_disease[disease]["id"],
-                                                         self.ent_drug[drug]["id"]))
-
-                if "recommand_eat" in data:
-                    for recipe in data["recommand_eat"]:
-                        if recipe not in self.ent_recipe:
-                            self.ent_recipe[recipe] = {"name": recipe, "id": self.global_identity}
-                            self.global_identity += 1
-                        self.rels_recommend_recipe.append((self.ent_disease[disease]["id"],
-                                                           self.ent_recipe[recipe]["id"]))
-
-                if "not_eat" in data:
-                    for food in data["not_eat"]:
-                        if food not in self.ent_food:
-                            self.ent_food[food] = {"name": food, "id": self.global_identity}
-                            self.global_identity += 1
-                        self.rels_avoid_eat.append((self.ent_disease[disease]["id"],
-                                                    self.ent_food[food]["id"]))
-
-                if "do_eat" in data:
-                    for food in data["do_eat"]:
-                        if food not in self.ent_food:
-                            self.ent_food[food] = {"name": food, "id": self.global_identity}
-                            self.global_identity += 1
-                        self.rels_advise_eat.append((self.ent_disease[disease]["id"],
-                                                     self.ent_food[food]["id"]))
-
-                if "symptom" in data:
-                    for symptom in data["symptom"]:
-                        if symptom not in self.ent_symptom:
-                            self.ent_symptom[symptom] = {"name": symptom, "id": self.global_identity}
-                            self.global_identity += 1
-                        self.rels_symptom.append((self.ent_disease[disease]["id"],
-                                                  self.ent_symptom[symptom]["id"]))
-
-                if "acompany" in data:
-                    for complication in data["acompany"]:
-                        if complication not in self.ent_disease:
-                            self.ent_disease[complication] = {"name": complication, "id": self.global_identity}
-                            self.global_identity += 1
-                        self.rels_complication.append((self.ent_disease[disease]["id"],
-                                                       self.ent_disease[complication]["id"]))
-
-                if "common_drug" in data:
-                    for drug in data["common_drug"]:
-                        if drug not in self.ent_drug:
-                            self.ent_drug[drug] = {"name": drug, "id": self.global_identity}
-                            self.global_identity += 1
-                        self.rels_common_drug.append((self.ent_disease[disease]["id"],
-                                                      self.ent_drug[drug]["id"]))
-
-                if "check" in data:
-                    for check in data["check"]:
-                        if check not in self.ent_check:
-                            self.ent_check[check] = {"name": check, "id": self.global_identity}
-                            self.global_identity += 1
-                        self.rels_need_check.append((self.ent_disease[disease]["id"],
-                                                     self.ent_check[check]["id"]))
-
-                if "cure_department" in data:
-                    for dept in data["cure_department"]:
-                        if dept not in self.ent_department:
-                            self.ent_department[dept] = {"name": dept, "id": self.global_identity}
-                            self.global_identity += 1
-                        self.rels_treat_department.append((self.ent_disease[disease]["id"],
-                                                           self.ent_department[dept]["id"]))
-
-                    if len(data["cure_department"]) == 2:
-                        small = data["cure_department"][1]
-                        big = data["cure_department"][0]
-                        self.rels_department.append((self.ent_department[small]["id"],
-                                                     self.ent_department[big]["id"]))
-
-                if "drug_detail" in data:
-                    re_patn = re.compile(r"(?P<company>\w+)\((?P<drug>\w+)\)")
-                    for item in data["drug_detail"]:
-                        res = re_patn.match(item)
-                        if res:
-                            company = res.group("company")
-                            drug = res.group("drug")
-                            company = company.replace(drug, "")
-                            if company not in self.ent_pharm_company:
-                                self.ent_pharm_company[company] = {"name": company, "id": self.global_identity}
-                                self.global_identity += 1
-                            if drug not in self.ent_drug:
-                                self.ent_drug[drug] = {"name": drug, "id": self.global_identity}
-                                self.global_identity += 1
-                            self.rels_produce_drug.append((self.ent_pharm_company[company]["id"],
-                                                           self.ent_drug[drug]["id"]))
-
-                if "cure_way" in data:
-                    for method in data["cure_way"]:
-                        if method not in self.ent_treatment:
-                            self.ent_treatment[method] = {"name": method, "id": self.global_identity}
-                            self.global_identity += 1
-                        self.rels_treatment_method.append((self.ent_disease[disease]["id"],
-                                                           self.ent_treatment[method]["id"]))
-
-        self.rels_department = list(set(self.rels_department))
-        self.rels_avoid_eat = list(set(self.rels_avoid_eat))
-        self.rels_advise_eat = list(set(self.rels_advise_eat))
-        self.rels_recommend_recipe = list(set(self.rels_recommend_recipe))
-        self.rels_common_drug = list(set(self.rels_common_drug))
-        self.rels_recommend_drug = list(set(self.rels_recommend_drug))
-        self.rels_need_check = list(set(self.rels_need_check))
-        self.rels_produce_drug = list(set(self.rels_produce_drug))
-        self.rels_complication = list(set(self.rels_complication))
-        self.rels_symptom = list(set(self.rels_symptom))
-        self.rels_treat_department = list(set(self.rels_treat_department))
-        self.rels_treatment_method = list(set(self.rels_treatment_method))
-
-        num_entities = len(self.ent_disease) + len(self.ent_symptom) + len(self.ent_drug) + \
-                       len(self.ent_check) + len(self.ent_department) + len(self.ent_food) + \
-                       len(self.ent_recipe) + len(self.ent_pharm_company)
-        num_rels = len(self.rels_department) + len(self.rels_avoid_eat) + len(self.rels_advise_eat) + \
-                   len(self.rels_recommend_recipe) + len(self.rels_common_drug) + len(self.rels_recommend_drug) + \
-                   len(self.rels_need_check) + len(self.rels_produce_drug) + len(self.rels_complication) + \
-                   len(self.rels_symptom) + len(self.rels_treat_department) + len(self.rels_treatment_method)
-        print("Has extracted {} entities and {} relationships.".format(num_entities, num_rels))
-
-    def export_entities(self):
-        entity_data_path = os.path.join(data_path, "entity")
-        if not os.path.exists(entity_data_path):
-            os.mkdir(entity_data_path)
-
-        self.export_nodes_to_csv(self.ent_disease, entity_type_disease,
-                                 os.path.join(entity_data_path, "disease.csv"),
-                                 ["id"], ["ID"])
-        self.export_nodes_to_csv(self.ent_symptom, entity_type_symptom,
-                                 os.path.join(entity_data_path, "symptom.csv"),
-                                 ["id"], ["ID"])
-        self.export_nodes_to_csv(self.ent_drug, entity_type_drug,
-                                 os.path.join(entity_data_path, "drug.csv"),
-                                 ["id"], ["ID"])
-        self.export_nodes_to_csv(self.ent_check, entity_type_check,
-                                 os.path.join(entity_data_path, "check.csv"),
-                                 ["id"], ["ID"])
-        self.export_nodes_to_csv(self.ent_department, entity_type_department,
-                                 os.path.join(entity_data_path, "department.csv"),
-                                 ["id"], ["ID"])
-        self.export_nodes_to_csv(self.ent_food, entity_type_food,
-                                 os.path.join(entity_data_path, "food.csv"),
-                                 ["id"], ["ID"])
-        self.export_nodes_to_csv(self.ent_recipe, entity_type_recipe,
-                                 os.path.join(entity_data_path, "recipe.csv"),
-                                 ["id"], ["ID"])
-        self.export_nodes_to_csv(self.ent_pharm_company, entity_type_pharm_company,
-                                 os.path.join(entity_data_path, "pharm_company.csv"),
-                                 ["id"], ["ID"])
-        self.export_nodes_to_csv(self.ent_treatment, entity_type_treatment,
-                                 os.path.join(entity_data_path, "treatment.csv"),
-                                 ["id"], ["ID"])
-
-    def export_relationships(self):
-        rels_data_path = os.path.join(data_path, "relationship")
-        if not os.path.exists(rels_data_path):
-            os.mkdir(rels_data_path)
-
-        self.export_edges_to_csv(self.rels_department, rels_type_belongs_to,
-                                 entity_type_department, entity_type_department,
-                                 os.path.join(rels_data_path, "belongs_to.csv"))
-        self.export_edges_to_csv(self.rels_avoid_eat, rels_type_avoid_eat,
-                                 entity_type_disease, entity_type_food,
-                                 os.path.join(rels_data_path, "avoid_eat.csv"))
-        self.export_edges_to_csv(self.rels_advise_eat, rels_type_advise_eat,
-                                 entity_type_disease, entity_type_food,
-                                 os.path.join(rels_data_path, "advise_eat.csv"))
-        self.export_edges_to_csv(self.rels_recommend_recipe, rels_type_recommend_recipe,
-                                 entity_type_disease, entity_type_recipe,
-                                 os.path.join(rels_data_path, "recommend_recipe.csv"))
-        self.export_edges_to_csv(self.rels_common_drug, rels_type_common_drug,
-                                 entity_type_disease, entity_type_drug,
-                                 os.path.join(rels_data_path, "common_drug.csv"))
-        self.export_edges_to_csv(self.rels_recommend_drug, rels_type_recommend_drug,
-                                 entity_type_disease, entity_type_drug,
-                                 os.path.join(rels_data_path, "recommend_drug.csv"))
-        self.export_edges_to_csv(self.rels_need_check, rels_type_need_check,
-                                 entity_type_disease, entity_type_check,
-                                 os.path.join(rels_data_path, "need_check.csv"))
-        self.export_edges_to_csv(self.rels_produce_drug, rels_type_produce_drug,
-                                 entity_type_pharm_company, entity_type_drug,
-                                 os.path.join(rels_data_path, "produce_drug.csv"))
-        self.export_edges_to_csv(self.rels_complication, rels_type_has_complication,
-                                 entity_type_disease, entity_type_disease,
-                                 os.path.join(rels_data_path, "has_complication.csv"))
-        self.export_edges_to_csv(self.rels_symptom, rels_type_has_symptom,
-                                 entity_type_disease, entity_type_symptom,
-                                 os.path.join(rels_data_path, "has_symptom.csv"))
-        self.export_edges_to_csv(self.rels_treat_department, rels_type_treat_department,
-                                 entity_type_disease, entity_type_department,
-                                 os.path.join(rels_data_path, "treat_department.csv"))
-        self.export_edges_to_csv(self.rels_treatment_method, rels_type_treatment_method,
-                                 entity_type_disease, entity_type_treatment,
-                                 os.path.join(rels_data_path, "treatment_method.csv"))
-
-    def export_nodes_to_csv(self, nodes, node_label, file_name, properties=None, field_types=None):
-        print("Exporting {} {} entities...".format(len(nodes), node_label))
-        df = pd.DataFrame(nodes.values())
-        if properties and field_types:
-            columns = ["{}:{}".format(p, f) for p, f in zip(properties, field_types)]
-            df.rename(columns=dict(zip(properties, columns)), inplace=True)
-        df[":LABEL"] = [node_label] * len(nodes)
-        df.to_csv(file_name, index=False, encoding="utf-8")
-
-    def export_edges_to_csv(self, edges, edge_type, from_type, to_type, file_name):
+                record = parse_record(line)
+                if record is None:
+                    print("Error: The name of disease is not found for line {}!".format(no))
+                    continue
+                self.add_record(record)
+                disease_id = self.store.get_id(entity_type_disease, record[0])
+                added[key] = (disease_id, self.store.pop_pending(), record[1])
+
+        removed = [key for key in state.records if key not in seen]
+        delta = state.apply(self.store, added, removed)
+        for identity, attributes in delta.attributes.items():
+            self.store.set_attributes(identity, attributes)
+        self.alive_ids = set(state.node_refs)
+        state.save(state_path)
+        self.record_extraction("extract_incremental", num_lines, file_size, len(delta.nodes_added),
+                               time.perf_counter() - start)
+
+        print("Build {}: {} records added and {} removed, {} entities added or updated and {} removed, "
+              "{} relationships added and {} removed.".format(
+                  delta.version, len(added), len(removed), len(delta.nodes_added), len(delta.nodes_removed),
+                  len(delta.edges_added), len(delta.edges_removed)))
+        return delta
+
+    @staticmethod
+    def _parse_sequential(file_path, progress):
+        with open(file_path, "rb") as file:
+            for line in file:
+                progress.update(len(line))
+                yield parse_record(line)
+
+    @staticmethod
+    def _parse_parallel(file_path, file_size, num_workers, num_shards, progress):
+        shards = split_shards(file_path, file_size, num_shards)
+        with multiprocessing.Pool(num_workers) as pool:
+            # imap keeps the order of shards, which keeps the order of lines
+            for (_, start, end), records in zip(shards, pool.imap(extract_shard, shards)):
+                progress.update(end - start)
+                for record in records:
+                    yield record
+
+    def add_record(self, record):
+        """Add entities and relationships of one parsed record, see `parse_record`. """
+        disease, disease_dict, data = record
+        store = self.store
+
+        disease_id = store.get_id(entity_type_disease, disease)
+        if disease_id is None:
+            disease_id = store.add(entity_type_disease, disease)
+            store.set_attributes(disease_id, disease_dict)
+
+        # (disease, relationship, entity) for the relationships starting from disease
+        for key, rel_type, entity_type in [
+            ("recommand_drug", rels_type_recommend_drug, entity_type_drug),
+            ("recommand_eat", rels_type_recommend_recipe, entity_type_recipe),
+            ("not_eat", rels_type_avoid_eat, entity_type_food),
+            ("do_eat", rels_type_advise_eat, entity_type_food),
+            ("symptom", rels_type_has_symptom, entity_type_symptom),
+            ("acompany", rels_type_has_complication, entity_type_disease),
+            ("common_drug", rels_type_common_drug, entity_type_drug),
+            ("check", rels_type_need_check, entity_type_check),
+            ("cure_department", rels_type_treat_department, entity_type_department),
+        ]:
+            for name in data.get(key, ()):
+                store.add_edge(rel_type, disease_id, store.get_or_add(entity_type, name))
+
+        # what department that a department belongs to, (department, belongs_to, department)
+        if len(data.get("cure_department", ())) == 2:
+            big, small = data["cure_department"]
+            store.add_edge(rels_type_belongs_to,
+                           store.get_id(entity_type_department, small),
+                           store.get_id(entity_type_department, big))
+
+        # drug the pharmaceutical company produce, (pharmaceutical company, produce_drug, drug)
+        for company, drug in data.get("drug_detail", ()):
+            company_id = store.get_or_add(entity_type_pharm_company, company)
+            store.add_edge(rels_type_produce_drug, company_id, store.get_or_add(entity_type_drug, drug))
+
+        for method in data.get("cure_way", ()):
+            store.add_edge(rels_type_treatment_method, disease_id,
+                           store.get_or_add(entity_type_treatment, method))
+
+    def finalize(self):
+        """Remove duplicated relationships and report the size of the graph. """
+        self.store.dedupe()
+        print("Has extracted {} entities and {} relationships.".format(self.store.num_entities(),
+                                                                     self.store.num_relationships()))
+
+    @staticmethod
+    def record_extraction(stage, num_lines, num_bytes, num_entities, seconds):
+        """Record counters and throughput of an extraction of `num_entities` from `num_lines`. """
+        print("Extracted {} lines in {:.1f}s: {:.0f} lines/s, {:.0f} entities/s.".format(
+            num_lines, seconds, num_lines / max(seconds, 1e-9), num_entities / max(seconds, 1e-9)))
+        metrics.observe("kbqa_build_seconds", seconds, stage=stage)
+        metrics.count("kbqa_build_lines_total", num_lines, stage=stage)
+        metrics.count("kbqa_build_bytes_read_total", num_bytes, stage=stage)
+        metrics.count("kbqa_build_entities_total", num_entities, stage=stage)
+        metrics.gauge("kbqa_build_lines_per_second", num_lines / max(seconds, 1e-9), stage=stage)
+        metrics.gauge("kbqa_build_entities_per_second", num_entities / max(seconds, 1e-9), stage=stage)
+
+    @staticmethod
+    def record_export(kind, file_name, num_rows, seconds):
+        """Record rows and bytes written to a file, `kind` is entity, relationship, snapshot or name. """
+        if not metrics.enabled:
+            return
+        metrics.observe("kbqa_export_seconds", seconds, kind=kind)
+        metrics.count("kbqa_export_rows_total", num_rows, kind=kind)
+        metrics.count("kbqa_export_bytes_total", os.path.getsize(file_name), kind=kind)
+
+    def export_entities(self, compress=False, max_workers=4):
+        self._export_concurrently(self._entity_tasks(compress), max_workers)
+
+    def export_relationships(self, compress=False, max_workers=4):
+        self._export_concurrently(self._relationship_tasks(compress), max_workers)
+
+    def export_graph(self, compress=False, max_workers=4):
+        """Export entities and relationships, writing all the files concurrently. """
+        self._export_concurrently(self._entity_tasks(compress) + self._relationship_tasks(compress), max_workers)
+
+    @staticmethod
+    def _export_concurrently(tasks, max_workers):
+        start = time.perf_counter()
+        run_concurrently(tasks, max_workers)
+        # wall time of the export, bytes written per second = kbqa_export_bytes_total / this
+        metrics.observe("kbqa_build_seconds", time.perf_counter() - start, stage="export_csv")
+
+    @staticmethod
+    def _csv_file(data_path, file_name, compress):
+        """Path of a csv file to export, the file of the other format from an earlier export is
+        removed, so that import_data.sh does not import both. """
+        suffix, other_suffix = (".csv.gz", ".csv") if compress else (".csv", ".csv.gz")
+        if os.path.exists(os.path.join(data_path, file_name + other_suffix)):
+            os.remove(os.path.join(data_path, file_name + other_suffix))
+        return os.path.join(data_path, file_name + suffix)
+
+    def _entity_tasks(self, compress):
+        entity_data_path = os.path.join(self.output_path, "entity")
+        os.makedirs(entity_data_path, exist_ok=True)
+
+        return [(self.export_nodes_to_csv,
+                 (entity_type, self._csv_file(entity_data_path, file_name, compress),
+                  disease_attributes if entity_type == entity_type_disease else None,
+                  None, compress))
+                for entity_type, file_name in entity_types]
+
+    def _relationship_tasks(self, compress):
+        rels_data_path = os.path.join(self.output_path, "relationship")
+        os.makedirs(rels_data_path, exist_ok=True)
+
+        return [(self.export_edges_to_csv,
+                 (rel_type, from_type, to_type, self._csv_file(rels_data_path, file_name, compress),
+                  None, compress))
+                for rel_type, from_type, to_type, file_name in relationship_types]
+
+    def export_nodes_to_csv(self, node_label, file_name, attributes=None, ids=None, compress=False):
+        ids = self.store.entity_ids(node_label).tolist() if ids is None else ids
+        print("Exporting {} {} entities...".format(len(ids), node_label))
+        start = time.perf_counter()
+        write_nodes(file_name, node_label, ids, (self.store.name_of(i) for i in ids),
+                    attributes, (self.store.attribute_values(i) for i in ids) if attributes else None,
+                    compress)
+        self.record_export("entity", file_name, len(ids), time.perf_counter() - start)
+
+    def export_edges_to_csv(self, edge_type, from_type, to_type, file_name, edges=None, compress=False):
+        edges = self.store.edges(edge_type) if edges is None else edges
         print("Exporting {} relationship ({}, {}, {})...".format(len(edges), edge_type,
                                                                  from_type, to_type))
-        df = pd.DataFrame(edges, columns=[":START_ID", ":END_ID"])
-        df[":TYPE"] = [edge_type] * len(edges)
-        df.to_csv(file_name, index=False, encoding="utf-8")
+        start = time.perf_counter()
+        write_edges(file_name, edge_type, edges, compress)
+        self.record_export("relationship", file_name, len(edges), time.perf_counter() - start)
+
+    def export_delta(self, delta):
+        """Export entities and relationships added and removed by an incremental build.
+
+        Files are written to delta/<version>/{added,removed}/{entity,relationship} of `output_path`
+        in the same format as the full export, and only for types having changes.
+        """
+        delta_data_path = os.path.join(self.output_path, "delta", str(delta.version))
+        for change, nodes, edges in [("added", delta.nodes_added, delta.edges_added),
+                                     ("removed", delta.nodes_removed, delta.edges_removed)]:
+            nodes_by_type = {}
+            for identity in nodes:
+                nodes_by_type.setdefault(self.store.label_of(identity), []).append(identity)
+            edges_by_type = {}
+            for rel_type, start, end in edges:
+                edges_by_type.setdefault(rel_type, []).append((start, end))
+
+            entity_data_path = os.path.join(delta_data_path, change, "entity")
+            os.makedirs(entity_data_path, exist_ok=True)
+            for entity_type, file_name in entity_types:
+                if entity_type in nodes_by_type:
+                    attributes = disease_attributes \
+                        if entity_type == entity_type_disease and change == "added" else None
+                    self.export_nodes_to_csv(entity_type,
+                                             os.path.join(entity_data_path, file_name + ".csv"),
+                                             attributes, nodes_by_type[entity_type])
+
+            rels_data_path = os.path.join(delta_data_path, change, "relationship")
+            os.makedirs(rels_data_path, exist_ok=True)
+            for rel_type, from_type, to_type, file_name in relationship_types:
+                if rel_type in edges_by_type:
+                    self.export_edges_to_csv(rel_type, from_type, to_type,
+                                             os.path.join(rels_data_path, file_name + ".csv"),
+                                             edges_by_type[rel_type])
+
+    def load_into_neo4j(self, driver, database=None, batch_size=10000, num_sessions=4):
+        """Load the graph into a running neo4j, instead of exporting csv files for neo4j-admin import
+        which needs a new database. """
+        return BulkLoader(driver, database, batch_size, num_sessions).load(self.store)
+
+    def export_snapshot(self, file_path=None):
+        """Write the graph as a binary snapshot which can be opened with mmap, see `GraphSnapshot`. """
+        file_path = file_path or os.path.join(self.output_path, "graph.snapshot")
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        print("Exporting snapshot of graph to {}...".format(file_path))
+        start = time.perf_counter()
+        build_version = write_snapshot(self.store, file_path)
+        self.record_export("snapshot", file_path, self.store.num_entities(), time.perf_counter() - start)
+        print("Snapshot of build {} is exported.".format(build_version))
+        return build_version
 
     def export_as_dictionary(self):
-        name_data_path = os.path.join(data_path, "name")
-        if not os.path.exists(name_data_path):
-            os.mkdir(name_data_path)
-
-        self.export_names(self.ent_disease.keys(),
-                          os.path.join(name_data_path, "disease.txt"))
-        self.export_names(self.ent_symptom.keys(),
-                          os.path.join(name_data_path, "symptom.txt"))
-        self.export_names(self.ent_drug.keys(),
-                          os.path.join(name_data_path, "drug.txt"))
-        self.export_names(self.ent_check.keys(),
-                          os.path.join(name_data_path, "check.txt"))
-        self.export_names(self.ent_department.keys(),
-                          os.path.join(name_data_path, "department.txt"))
-        self.export_names(self.ent_food.keys(),
-                          os.path.join(name_data_path, "food.txt"))
-        self.export_names(self.ent_recipe.keys(),
-                          os.path.join(name_data_path, "recipe.txt"))
-        self.export_names(self.ent_pharm_company.keys(),
-                          os.path.join(name_data_path, "pharm_company.txt"))
-        self.export_names(self.ent_treatment.keys(),
-                          os.path.join(name_data_path, "treatment.txt"))
+        """Write the names of entities of every type, one a line, to name/ of `output_path`.
+
+        After an incremental build these are the names of entities alive after the delta, so they
+        match neo4j once the delta is applied, but not graph.snapshot, which only a full build writes.
+        """
+        name_data_path = os.path.join(self.output_path, "name")
+        os.makedirs(name_data_path, exist_ok=True)
+
+        for entity_type, file_name in entity_types:
+            names = self.store.entity_names(entity_type)
+            if self.alive_ids is not None:
+                names = [n for n in names if self.store.get_id(entity_type, n) in self.alive_ids]
+            self.export_names(names,
+                              os.path.join(name_data_path, file_name + ".txt"))
 
     def export_names(self, names, file_name):
+        start = time.perf_counter()
         with open(file_name, "w", encoding="utf-8") as file:
             for n in names:
                 file.write(n + "\n")
+        self.record_export("name", file_name, len(names), time.perf_counter() - start)
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build knowledge graph of disease from medical.json.")
+    parser.add_argument("--input", default="./data/medical.json", help="path of medical.json")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes to parse the input, 1 to parse sequentially")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only extract new or changed records and export the delta, "
+                             "the name lists are rewritten for the graph after the delta")
+    parser.add_argument("--state", default=os.path.join(data_path, "build_state.pkl"),
+                        help="path of the state kept between incremental builds")
+    parser.add_argument("--export-csv", action="store_true",
+                        help="export entities and relationships as csv files for neo4j-admin import")
+    parser.add_argument("--compress", action="store_true", help="gzip compress the exported csv files")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="export a binary snapshot of the graph for in-process queries")
+    parser.add_argument("--bundle", help="directory of the bundle to add the snapshot, name lists and intent model to")
+    parser.add_argument("--intent-model", help="exported intent model or checkpoint to put into the bundle")
+    parser.add_argument("--load", metavar="URI", help="load the graph into the running neo4j at URI, "
+                                                      "with the password in NEO4J_PASSWORD, neo4j 3.5 or later")
+    parser.add_argument("--user", default="neo4j", help="user of neo4j for --load")
+    parser.add_argument("--database", help="database of neo4j 4.0 or later for --load, "
+                                           "the default one if not given")
+    parser.add_argument("--batch-size", type=int, default=10000, help="rows written by one statement for --load")
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent sessions for --load")
+    parser.add_argument("--metrics", help="write counters and timings of the build in Prometheus text format")
+    args = parser.parse_args()
+    if args.bundle and (args.incremental or not args.intent_model):
+        parser.error("--bundle needs --intent-model and a full build")
+    # after an incremental build the store holds no relationships, they are only in the delta
+    for flag in ("export_csv", "compress", "snapshot", "load"):
+        if args.incremental and getattr(args, flag):
+            parser.error("--{} needs a full build".format(flag.replace("_", "-")))
+    if args.metrics:
+        metrics.enable()
+
     extractor = DiseaseGraphExtractor()
-    extractor.extract("./data/medical.json")
-    # extractor.export_entities()
-    # extractor.export_relationships()
+    if args.incremental:
+        extractor.export_delta(extractor.extract_incremental(args.input, args.state))
+    else:
+        extractor.extract(args.input, num_workers=args.workers)
+        if args.export_csv:
+            extractor.export_graph(compress=args.compress)
+        if args.snapshot or args.bundle:
+            extractor.export_snapshot()
+        if args.load:
+            from app.query.cypher import create_driver
+
+            driver = create_driver(args.load, args.user, os.environ.get("NEO4J_PASSWORD", ""),
+                                   pool_size=max(args.sessions, 1) + 1)
+            try:
+                extractor.load_into_neo4j(driver, args.database, args.batch_size, args.sessions)
+            finally:
+                driver.close()
     extractor.export_as_dictionary()
+    if args.bundle:
+        version = write_bundle(args.bundle, os.path.join(data_path, "graph.snapshot"), os.path.join(data_path, "name"),
+                               args.intent_model)
+        print("Bundle {} is written to {}.".format(version, args.bundle))
+    if args.metrics:
+        metrics.dump(args.metrics)
@@ -0,0 +1,20 @@
+"""
+@desc: Helpers shared by the benchmark scripts.
+
+Scripts are run as `python scripts/<name>.py`, so each puts the root of the repo on sys.path
+first, then imports this module and others as `scripts.<name>`.
+"""
+import os
+
+root_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def percentile(values, p):
+    """The p-th percentile of values, by the nearest rank. """
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+def percentiles(values, prefix=""):
+    """{prefix + "p50": ..., "p95": ..., "p99": ...} of values. """
+    return {"{}p{}".format(prefix, p): percentile(values, p) for p in (50, 95, 99)}
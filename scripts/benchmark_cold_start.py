@@ -0,0 +1,108 @@
+"""
+@desc: Import time and time to first answer of MedicalBot on a bundle.
+
+Usage:
+    python scripts/benchmark_cold_start.py [--scale 1] [--repeat 3]
+
+A bundle is built from a synthetic corpus and an untrained exported intent model, then
+every start mode is timed in fresh processes:
+
+    eager       every component is loaded before the first question
+    lazy        components are loaded by the first question that needs them
+    background  a warm up thread is started with the bot, the first question waits for
+                what it needs
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from scripts.bench_utils import root_path
+from scripts.generate_corpus import generate_corpus, sample_size
+
+question = "疾病0吃什么药"
+
+child_code = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root_path!r})
+from app.medical_bot import MedicalBot
+imported = time.perf_counter()
+heavy = [name for name in ("numpy", "scipy", "torch", "transformers") if name in sys.modules]
+bot = MedicalBot.from_bundle({bundle_path!r}, warm_up={mode!r} == "background")
+if {mode!r} == "eager":
+    bot.warm_up()
+created = time.perf_counter()
+answer = bot.answer({question!r})
+answered = time.perf_counter()
+ready = bot.ready(None)
+warm = time.perf_counter()
+print(json.dumps({{"import": imported - start, "create": created - imported, "first_answer": answered - start,
+                  "warm": warm - start if ready else None, "answered": answer is not None, "heavy": heavy}}))
+"""
+
+# what importing the intent model module cost when it imported transformers at the top
+heavy_import_code = """
+import time
+start = time.perf_counter()
+import torch, transformers
+from transformers import BertModel
+print(time.perf_counter() - start)
+"""
+
+
+def build_bundle(work_path, scale):
+    from app.bundle import write_bundle
+    from app.nlu.medical_intent_recognizer.export import export_recognizer
+    from app.nlu.medical_intent_recognizer.intent_recognizer import IntentRecognizer
+    from build_kg import DiseaseGraphExtractor
+
+    corpus_path = os.path.join(work_path, "medical.json")
+    generate_corpus(corpus_path, int(sample_size * scale))
+    extractor = DiseaseGraphExtractor(output_path=work_path)
+    extractor.extract(corpus_path)
+    extractor.export_snapshot()
+    extractor.export_as_dictionary()
+    model_path = os.path.join(work_path, "intent.pt")
+    export_recognizer(IntentRecognizer.from_dataset(), model_path)
+    bundle_path = os.path.join(work_path, "bundle")
+    write_bundle(bundle_path, os.path.join(work_path, "graph.snapshot"), os.path.join(work_path, "name"), model_path)
+    return bundle_path
+
+
+def run_child(code):
+    output = subprocess.run([sys.executable, "-W", "ignore", "-c", code], check=True, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(mode, bundle_path):
+    return run_child(child_code.format(root_path=root_path, bundle_path=bundle_path, mode=mode, question=question))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1, help="size of the corpus relative to medical.json")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each mode, the fastest is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_path:
+        bundle_path = build_bundle(work_path, args.scale)
+        print("\nimport of torch and transformers: {:.3f} s".format(
+            min(run_child(heavy_import_code) for _ in range(args.repeat))))
+        print("{:<12} {:>10} {:>10} {:>14} {:>10}  {}".format(
+            "mode", "import s", "create s", "first answer s", "warm s", "imported by app"))
+        for mode in ("eager", "lazy", "background"):
+            results = [run(mode, bundle_path) for _ in range(args.repeat)]
+            best = min(results, key=lambda r: r["first_answer"])
+            print("{:<12} {:>10.3f} {:>10.3f} {:>14.3f} {:>10}  {}".format(
+                mode, best["import"], best["create"], best["first_answer"],
+                "-" if best["warm"] is None else "{:.3f}".format(best["warm"]), ", ".join(best["heavy"]) or "-"))
+
+
+if __name__ == '__main__':
+    main()
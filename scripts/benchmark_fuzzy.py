@@ -0,0 +1,94 @@
+"""
+@desc: Latency and recall of fuzzy matching against the exact entity linker.
+
+Usage:
+    python scripts/benchmark_fuzzy.py [--names data/name] [--queries 1000]
+
+Queries are disease and symptom names with one random edit (substitution, deletion,
+insertion or transposition of characters). A query is recalled if the original name
+is among the results.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from app.nlu.entity_linker import EntityLinker
+from app.nlu.fuzzy_matcher import FuzzyMatcher, bounded_distance
+from scripts.bench_utils import percentile, root_path
+from scripts.benchmark_linker import generate_dictionaries, read_questions
+
+
+def misspell(name, chars, rnd):
+    pos = rnd.randrange(len(name))
+    op = rnd.choice(["substitute", "delete", "insert", "transpose"])
+    if op == "substitute":
+        return name[:pos] + rnd.choice(chars) + name[pos + 1:]
+    if op == "delete":
+        return name[:pos] + name[pos + 1:]
+    if op == "insert":
+        return name[:pos] + rnd.choice(chars) + name[pos:]
+    pos = min(pos, len(name) - 2)
+    return name[:pos] + name[pos + 1] + name[pos] + name[pos + 2:]
+
+
+def run(name, func, queries):
+    latencies = []
+    hits = 0
+    for query, target in queries:
+        start = time.perf_counter()
+        found = func(query)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        hits += target in found
+    print("{:<22} recall {:>6.1%}  p50 {:>9.1f} us  p99 {:>9.1f} us".format(
+        name, hits / len(queries), percentile(latencies, 50), percentile(latencies, 99)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--names", default=os.path.join(root_path, "data", "name"),
+                        help="directory of name lists")
+    parser.add_argument("--queries", type=int, default=1000, help="number of misspelled names")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_path:
+        name_data_path = args.names
+        if not os.path.exists(os.path.join(name_data_path, "disease.txt")):
+            name_data_path = tmp_path
+            generate_dictionaries(name_data_path, read_questions())
+        start = time.perf_counter()
+        matcher = FuzzyMatcher.from_dictionaries(name_data_path)
+        print("{} names indexed in {:.3f} s".format(len(matcher.names), time.perf_counter() - start))
+        linker = EntityLinker.from_dictionaries(name_data_path)
+
+    rnd = random.Random(0)
+    chars = sorted({c for name in matcher.names for c in name})
+    names = [name for name in matcher.names if len(name) >= 3]
+    queries = []
+    for name in rnd.sample(names, min(args.queries, len(names))):
+        queries.append((misspell(name, chars, rnd), name))
+
+    run("exact linker", lambda q: [m.name for m in linker.link(q)], queries)
+    run("exact, clean names", lambda q: [m.name for m in linker.link(q)], [(t, t) for _, t in queries])
+    for top_k in (1, 5):
+        run("fuzzy top-{}".format(top_k),
+            lambda q: [m.name for m in matcher.search(q, top_k=top_k, threshold=0.6)], queries)
+
+    def scan(query):
+        results = []
+        for name in matcher.names:
+            bound = int(0.4 * max(len(query), len(name)))
+            if bounded_distance(query, name, bound) <= bound:
+                results.append(name)
+        return results
+    run("brute-force, first 50", scan, queries[:50])
+    run("fuzzy top-5, first 50", lambda q: [m.name for m in matcher.search(q, top_k=5, threshold=0.6)],
+        queries[:50])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+@desc: Accuracy and CPU latency of the exported intent models.
+
+Usage:
+    python scripts/benchmark_intent_export.py [--bert-path PATH] [--epochs 5] [--bert-epochs 2]
+
+TextCNN and BertTextCNN are trained shortly on the train set, then the eager model, the
+eager model with int8 linear layers and the TorchScript exports in float32 and int8 are
+compared on the 731 questions of the test set: accuracy, agreement with the eager model,
+per query latency and latency in batches, and the size of the exported file.
+
+Without --bert-path, a small BERT (4 layers, hidden size 256) initialized at random with a
+vocabulary of the characters of the dataset stands in for a pretrained one.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import torch
+from torch import nn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from app.nlu.medical_intent_recognizer.export import export_recognizer, quantize_linear
+from app.nlu.medical_intent_recognizer.intent_recognizer import IntentRecognizer, data_path, read_dataset
+from scripts.bench_utils import percentile
+
+
+def train(recognizer, texts, labels, epochs, lr, batch_size=32):
+    model = recognizer.model.train()
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    loss_fn = nn.CrossEntropyLoss()
+    order = list(range(len(texts)))
+    for epoch in range(epochs):
+        random.shuffle(order)
+        total = 0
+        for begin in range(0, len(order), batch_size):
+            batch = order[begin:begin + batch_size]
+            ids, lengths = recognizer.encode([texts[no] for no in batch])
+            loss = loss_fn(model(ids, lengths), torch.tensor([labels[no] for no in batch]))
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(batch)
+        print("  epoch {} loss {:.4f}".format(epoch + 1, total / len(texts)))
+    model.eval()
+
+
+def random_bert(model_path, texts):
+    from transformers import BertConfig, BertModel
+
+    chars = sorted({char.lower() for text in texts for char in text})
+    with open(os.path.join(model_path, "vocab.txt"), "w", encoding="utf-8") as file:
+        file.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + chars) + "\n")
+    config = BertConfig(vocab_size=len(chars) + 5, hidden_size=256, num_hidden_layers=4, num_attention_heads=4,
+                        intermediate_size=1024)
+    BertModel(config).save_pretrained(model_path)
+
+
+def evaluate(name, recognizer, questions, label_names, reference, batch_size, size=None):
+    recognizer.predict(questions[:batch_size])  # warm up
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        recognizer.predict([question])
+        latencies.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    intents = []
+    for begin in range(0, len(questions), batch_size):
+        intents.extend(recognizer.predict(questions[begin:begin + batch_size]))
+    batched = (time.perf_counter() - start) * 1000 / len(questions)
+    accuracy = sum(a == b for a, b in zip(intents, label_names)) / len(questions)
+    agreement = sum(a == b for a, b in zip(intents, reference or intents)) / len(questions)
+    print("{:<18} {:>8.2%} {:>9.2%} {:>9.3f} {:>9.3f} {:>12.3f} {:>9}".format(
+        name, accuracy, agreement, percentile(latencies, 50), percentile(latencies, 99), batched,
+        "-" if size is None else "{:.1f}MB".format(size / 2 ** 20)))
+    return intents
+
+
+def compare(name, recognizer, questions, label_names, batch_size, work_path):
+    print("\n{:<18} {:>8} {:>9} {:>9} {:>9} {:>12} {:>9}".format(
+        name, "accuracy", "agreement", "p50 ms", "p99 ms", "batch ms/q", "file"))
+    reference = evaluate("eager fp32", recognizer, questions, label_names, None, batch_size)
+    quantized = IntentRecognizer(quantize_linear(recognizer.model), recognizer.vocab, recognizer.labels,
+                                 recognizer.max_length, tokenizer=recognizer.tokenizer,
+                                 min_length=recognizer.min_length)
+    evaluate("eager int8", quantized, questions, label_names, reference, batch_size)
+    for quantize in (False, True):
+        file_path = os.path.join(work_path, "{}.{}.pt".format(name, "int8" if quantize else "fp32"))
+        export_recognizer(recognizer, file_path, quantize=quantize)
+        evaluate("torchscript " + ("int8" if quantize else "fp32"), IntentRecognizer.load_exported(file_path),
+                 questions, label_names, reference, batch_size, os.path.getsize(file_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--bert-path", help="directory of a pretrained BERT with vocab.txt")
+    parser.add_argument("--epochs", type=int, default=5, help="epochs to train TextCNN")
+    parser.add_argument("--bert-epochs", type=int, default=2, help="epochs to train BertTextCNN")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    random.seed(0)
+    texts, _, labels = read_dataset(os.path.join(data_path, "train.csv"))
+    questions, label_names, _ = read_dataset(os.path.join(data_path, "test.csv"))
+
+    with tempfile.TemporaryDirectory() as work_path:
+        print("training TextCNN")
+        recognizer = IntentRecognizer.from_dataset()
+        train(recognizer, texts, labels, args.epochs, lr=1e-3)
+        compare("TextCNN", recognizer, questions, label_names, args.batch_size, work_path)
+
+        bert_path = args.bert_path
+        if bert_path is None:
+            bert_path = os.path.join(work_path, "bert")
+            os.makedirs(bert_path)
+            random_bert(bert_path, texts)
+        print("\ntraining BertTextCNN")
+        recognizer = IntentRecognizer.from_bert(bert_path)
+        train(recognizer, texts, labels, args.bert_epochs, lr=1e-4)
+        compare("BertTextCNN", recognizer, questions, label_names, args.batch_size, work_path)
+
+
+if __name__ == '__main__':
+    main()
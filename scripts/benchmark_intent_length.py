@@ -0,0 +1,66 @@
+"""
+@desc: CPU latency of the intent classifier with fixed and variable length inputs.
+
+Usage:
+    python scripts/benchmark_intent_length.py [--batch-size 32]
+
+Runs the 731 questions of the test set through the same untrained model twice:
+padded to `max_length`, which is the longest question of the dataset, as TextCNN
+used to require, and padded to the longest question in each length bucket.
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from app.nlu.medical_intent_recognizer.intent_recognizer import IntentRecognizer, data_path, read_dataset
+from scripts.bench_utils import percentile
+
+
+def per_query(recognizer, questions):
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        recognizer.predict([question])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def batched(recognizer, questions, batch_size):
+    start = time.perf_counter()
+    for begin in range(0, len(questions), batch_size):
+        recognizer.predict(questions[begin:begin + batch_size])
+    return (time.perf_counter() - start) * 1000 / len(questions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    questions = read_dataset(os.path.join(data_path, "test.csv"))[0]
+    max_length = max(len(q) for q in questions + read_dataset(os.path.join(data_path, "train.csv"))[0])
+    variable = IntentRecognizer.from_dataset(max_length=max_length)
+    fixed = IntentRecognizer(variable.model, variable.vocab, variable.labels, max_length, fixed_length=True)
+    lengths = sorted(len(q) for q in questions)
+    print("{} questions, median length {}, max_length {}".format(len(questions), lengths[len(lengths) // 2],
+                                                                max_length))
+
+    for name, recognizer in [("fixed length", fixed), ("variable length", variable)]:
+        recognizer.predict(questions[:args.batch_size])  # warm up
+        latencies = per_query(recognizer, questions)
+        print("{:<16} per query: mean {:.3f} ms  p50 {:.3f} ms  p99 {:.3f} ms;  batch of {}: {:.3f} ms/query".format(
+            name, sum(latencies) / len(latencies), percentile(latencies, 50), percentile(latencies, 99),
+            args.batch_size, batched(recognizer, questions, args.batch_size)))
+
+    agree = sum(a == b for a, b in zip(fixed.predict(questions), variable.predict(questions)))
+    print("same intent for {} of {} questions".format(agree, len(questions)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+@desc: Load test of the micro-batching intent recognizer.
+
+Usage:
+    python scripts/benchmark_intent_server.py [--frontend thread|asyncio] [--concurrency 64]
+
+Questions of the intent test set are sent by `concurrency` concurrent clients, and the
+throughput and p50/p99 latency are reported for every max batch size, next to calling
+the recognizer directly from each client. The model is untrained, which does not
+change its cost.
+"""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from app.nlu.medical_intent_recognizer.batcher import MicroBatcher
+from app.nlu.medical_intent_recognizer.intent_recognizer import IntentRecognizer, data_path, read_dataset
+from scripts.bench_utils import percentile
+
+
+def timed(func, question):
+    start = time.perf_counter()
+    func(question)
+    return time.perf_counter() - start
+
+
+def load_threads(func, questions, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(lambda q: timed(func, q), questions))
+    return latencies, time.perf_counter() - start
+
+
+def load_asyncio(batcher, questions, concurrency):
+    async def client(semaphore, question):
+        async with semaphore:
+            start = time.perf_counter()
+            await batcher.recognize_async(question)
+            return time.perf_counter() - start
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*[client(semaphore, q) for q in questions])
+
+    start = time.perf_counter()
+    latencies = asyncio.run(run())
+    return latencies, time.perf_counter() - start
+
+
+def report(name, latencies, seconds):
+    print("{:<16} {:>8.0f} questions/s  p50 {:>8.2f} ms  p99 {:>8.2f} ms".format(
+        name, len(latencies) / seconds, percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--frontend", choices=["thread", "asyncio"], default="thread")
+    parser.add_argument("--concurrency", type=int, default=64, help="number of concurrent clients")
+    parser.add_argument("--max-wait", type=float, default=0.002, help="max seconds to wait for a batch")
+    parser.add_argument("--batch-sizes", default="1,4,8,16,32,64")
+    parser.add_argument("--repeat", type=int, default=3, help="times to send the test set")
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    recognizer = IntentRecognizer.from_dataset()
+    questions = read_dataset(os.path.join(data_path, "test.csv"))[0] * args.repeat
+    recognizer.predict(questions[:64])  # warm up
+
+    if args.frontend == "thread":
+        report("unbatched", *load_threads(recognizer.recognize, questions, args.concurrency))
+    for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+        with MicroBatcher(recognizer, max_batch_size=batch_size, max_wait=args.max_wait) as batcher:
+            if args.frontend == "thread":
+                result = load_threads(batcher.recognize, questions, args.concurrency)
+            else:
+                result = load_asyncio(batcher, questions, args.concurrency)
+        report("batch {}".format(batch_size), *result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+@desc: Throughput of the entity linker on the questions of the intent test set.
+
+Usage:
+    python scripts/benchmark_linker.py [--names data/name]
+
+Names are read from the lists exported by build_kg.py, or generated from the
+characters of the questions if the lists do not exist. The linker is compared with
+scanning every name with the `in` operator.
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from app.kg.schema import entity_types
+from app.nlu.entity_linker import EntityLinker, dictionary_files, read_names
+from scripts.bench_utils import root_path
+
+test_data_path = os.path.join(root_path, "app", "nlu", "medical_intent_recognizer", "data", "test.csv")
+# number of names of each type in the lists built from the crawled medical.json
+dictionary_sizes = [8808, 5998, 3828, 3353, 54, 4870, 4870, 17201, 544]
+
+
+def read_questions(file_path=test_data_path):
+    with open(file_path, "r", encoding="utf-8") as file:
+        return [row["originalText"] for row in csv.DictReader(file)]
+
+
+def generate_dictionaries(name_data_path, questions, seed=0):
+    """Write name lists of random strings drawn from the characters of questions. """
+    rnd = random.Random(seed)
+    chars = [c for q in questions for c in q if "一" <= c <= "鿿"]
+    words = [q[i:i + rnd.randint(2, 4)] for q in questions for i in range(0, len(q) - 2, 3)]
+    for (label, file_name), size in zip(entity_types, dictionary_sizes):
+        with open(os.path.join(name_data_path, file_name + ".txt"), "w", encoding="utf-8") as file:
+            for _ in range(size):
+                if rnd.random() < 0.05:
+                    name = rnd.choice(words)
+                else:
+                    name = "".join(rnd.choice(chars) for _ in range(rnd.randint(2, 6)))
+                file.write(name + "\n")
+
+
+def throughput(func, questions, min_seconds=1.0):
+    count = 0
+    start = time.perf_counter()
+    while True:
+        for q in questions:
+            func(q)
+        count += len(questions)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--names", default=os.path.join(root_path, "data", "name"),
+                        help="directory of name lists")
+    args = parser.parse_args()
+
+    questions = read_questions()
+    with tempfile.TemporaryDirectory() as tmp_path:
+        name_data_path = args.names
+        if not os.path.exists(os.path.join(name_data_path, "disease.txt")):
+            name_data_path = tmp_path
+            generate_dictionaries(name_data_path, questions)
+        names = list(read_names(
+            [(label, path) for label, path in dictionary_files(name_data_path) if os.path.exists(path)]))
+        print("{} names, {} questions".format(len(names), len(questions)))
+
+        cache_path = os.path.join(tmp_path, "linker.pkl")
+        start = time.perf_counter()
+        linker = EntityLinker.from_dictionaries(name_data_path, cache_path)
+        print("compile and cache: {:.3f} s".format(time.perf_counter() - start))
+        start = time.perf_counter()
+        EntityLinker.from_dictionaries(name_data_path, cache_path)
+        print("load from cache:   {:.3f} s".format(time.perf_counter() - start))
+
+    mentions = sum(len(linker.link(q)) for q in questions)
+    print("mentions found:    {}".format(mentions))
+    print("linker:            {:>10.0f} questions/s".format(throughput(linker.link, questions)))
+
+    name_list = [name for _, name in names]
+    print("substring scan:    {:>10.0f} questions/s".format(
+        throughput(lambda q: [n for n in name_list if n in q], questions[:50])))
+
+
+if __name__ == '__main__':
+    main()
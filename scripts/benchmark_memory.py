@@ -0,0 +1,82 @@
+"""
+@desc: Compare peak RSS of DiseaseGraphExtractor.extract on a synthetic corpus.
+
+Usage:
+    python scripts/benchmark_memory.py --scale 10 --baseline <git revision>
+
+Every implementation is run in a fresh process, so that the peak RSS reported by
+getrusage only covers one extraction. With --baseline, build_kg.py of that revision
+is checked out to a temporary directory and measured as well.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from scripts.bench_utils import root_path
+from scripts.generate_corpus import generate_corpus, sample_size
+
+
+def run_child(module_path, corpus_path):
+    sys.path.insert(0, module_path)
+    sys.path.insert(1, root_path)
+    import build_kg
+
+    start = time.perf_counter()
+    extractor = build_kg.DiseaseGraphExtractor()
+    extractor.extract(corpus_path)
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"peak_rss_mb": round(peak_rss / 1024, 1), "seconds": round(seconds, 2)}))
+
+
+def measure(module_path, corpus_path):
+    output = subprocess.run([sys.executable, os.path.realpath(__file__),
+                             "--child", module_path, "--corpus", corpus_path],
+                            check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            universal_newlines=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--scale", type=float, default=10, help="size of corpus relative to the sample")
+    parser.add_argument("--corpus", help="path of corpus, generated if it does not exist")
+    parser.add_argument("--baseline", help="git revision of build_kg.py to compare with")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.corpus)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_path:
+        corpus_path = args.corpus or os.path.join(tmp_path, "medical.json")
+        if not os.path.exists(corpus_path):
+            num_records = int(sample_size * args.scale)
+            print("Generating {} records to {}...".format(num_records, corpus_path))
+            generate_corpus(corpus_path, num_records)
+
+        results = {"current": measure(root_path, corpus_path)}
+        if args.baseline:
+            baseline_path = os.path.join(tmp_path, "baseline")
+            os.mkdir(baseline_path)
+            source = subprocess.run(["git", "-C", root_path, "show", args.baseline + ":build_kg.py"],
+                                    check=True, stdout=subprocess.PIPE).stdout
+            with open(os.path.join(baseline_path, "build_kg.py"), "wb") as file:
+                file.write(source)
+            results[args.baseline] = measure(baseline_path, corpus_path)
+
+    for name, res in results.items():
+        print("{:<12} peak RSS {:>8.1f} MB  {:>7.2f} s".format(name, res["peak_rss_mb"], res["seconds"]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""
+@desc: Repeatable benchmarks of building the graph and answering questions, saved as JSON.
+
+Usage:
+    python scripts/benchmark_suite.py [--scale 1] [--repeat 3] [--output FILE] [--compare OLD.json]
+
+On a synthetic corpus of scripts/generate_corpus.py, every benchmark is run `repeat`
+times in a fresh process, and the median of every number is reported:
+
+    extract   DiseaseGraphExtractor.extract: seconds, lines/s, entities/s and peak RSS
+    export    csv files, gzip compressed csv files, snapshot and name lists: seconds,
+              bytes written, and RSS taken by exporting on top of extracting
+    linking   EntityLinker: seconds to compile, questions/s and us per question on
+              generated questions and on the intent test set
+    answer    MedicalBot on a bundle with an untrained intent model: latency without cache,
+              p50/p95/p99 in total and by stage, and latency of cached answers
+
+Results are written with the git revision, the machine and the arguments, and with
+--compare the medians are printed next to those of an earlier result file.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from scripts.bench_utils import percentiles, root_path
+from scripts.generate_corpus import generate_corpus, generate_questions, sample_size
+
+benchmarks = ("extract", "export", "linking", "answer")
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def extract(corpus_path):
+    from build_kg import DiseaseGraphExtractor
+
+    extractor = DiseaseGraphExtractor()
+    start = time.perf_counter()
+    extractor.extract(corpus_path)
+    return extractor, time.perf_counter() - start
+
+
+def bench_extract(corpus_path, work_path, questions):
+    extractor, seconds = extract(corpus_path)
+    with open(corpus_path, "rb") as file:
+        num_lines = sum(1 for _ in file)
+    return {"seconds": seconds, "lines_per_second": num_lines / seconds,
+            "entities_per_second": extractor.store.num_entities() / seconds,
+            "entities": extractor.store.num_entities(), "relationships": extractor.store.num_relationships(),
+            "peak_rss_mb": peak_rss_mb()}
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def bench_export(corpus_path, work_path, questions):
+    extractor, _ = extract(corpus_path)
+    extract_rss = peak_rss_mb()
+    result = {}
+    for name, compress in [("csv", False), ("csv_gzip", True)]:
+        output_path = os.path.join(work_path, name)
+        extractor.output_path = output_path
+        start = time.perf_counter()
+        extractor.export_graph(compress=compress)
+        result[name + "_seconds"] = time.perf_counter() - start
+        result[name + "_bytes"] = directory_size(output_path)
+
+    extractor.output_path = os.path.join(work_path, "other")
+    start = time.perf_counter()
+    extractor.export_snapshot()
+    result["snapshot_seconds"] = time.perf_counter() - start
+    start = time.perf_counter()
+    extractor.export_as_dictionary()
+    result["names_seconds"] = time.perf_counter() - start
+    result["snapshot_bytes"] = os.path.getsize(os.path.join(extractor.output_path, "graph.snapshot"))
+    result["peak_rss_mb"] = peak_rss_mb()
+    result["export_rss_mb"] = result["peak_rss_mb"] - extract_rss
+    return result
+
+
+def link_rate(linker, questions):
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        linker.link(question)
+        latencies.append(time.perf_counter() - start)
+    return len(questions) / sum(latencies), sorted(latencies)[len(latencies) // 2] * 1e6
+
+
+def bench_linking(corpus_path, work_path, questions):
+    from app.nlu.entity_linker import EntityLinker
+    from scripts.benchmark_linker import read_questions
+
+    extractor, _ = extract(corpus_path)
+    extractor.output_path = work_path
+    extractor.export_as_dictionary()
+    start = time.perf_counter()
+    linker = EntityLinker.from_dictionaries(os.path.join(work_path, "name"))
+    result = {"compile_seconds": time.perf_counter() - start}
+    result["questions_per_second"], result["p50_us"] = link_rate(linker, questions)
+    result["test_set_questions_per_second"], result["test_set_p50_us"] = link_rate(linker, read_questions())
+    return result
+
+
+def bench_answer(corpus_path, work_path, questions):
+    from app.answer_cache import AnswerCache
+    from app.bundle import write_bundle
+    from app.medical_bot import MedicalBot
+    from app.nlu.medical_intent_recognizer.export import export_recognizer
+    from app.nlu.medical_intent_recognizer.intent_recognizer import IntentRecognizer
+    from app.utils.metrics import answer_seconds, metrics, stage_seconds
+    import torch
+
+    extractor, _ = extract(corpus_path)
+    extractor.output_path = work_path
+    extractor.export_snapshot()
+    extractor.export_as_dictionary()
+    torch.manual_seed(0)
+    model_path = os.path.join(work_path, "intent.pt")
+    export_recognizer(IntentRecognizer.from_dataset(), model_path)
+    bundle_path = os.path.join(work_path, "bundle")
+    write_bundle(bundle_path, os.path.join(work_path, "graph.snapshot"), os.path.join(work_path, "name"), model_path)
+
+    bot = MedicalBot.from_bundle(bundle_path)
+    bot.warm_up()
+    metrics.enable()
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        bot.answer(question)
+        latencies.append(time.perf_counter() - start)
+    result = {"questions_per_second": len(questions) / sum(latencies)}
+    result.update((key, value * 1e3) for key, value in percentiles(latencies, "ms_").items())
+    for labels, item in metrics.summary().get(stage_seconds, {}).items():
+        stage = dict(labels)["stage"]
+        result.update(("{}_ms_p{}".format(stage, p), item["p{}".format(p)] * 1e3) for p in (50, 95, 99))
+
+    # answers of questions asked before come from the question cache
+    metrics.enable(False)
+    bot.answer_cache = AnswerCache(ttl=None)
+    for question in questions:
+        bot.answer(question)
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        bot.answer(question)
+        latencies.append(time.perf_counter() - start)
+    result.update((key, value * 1e3) for key, value in percentiles(latencies, "cached_ms_").items())
+    result["intents"] = len(metrics.summary().get(answer_seconds, {}))
+    return result
+
+
+def run_child(name, corpus_path, questions_path):
+    with open(questions_path, "r", encoding="utf-8") as file:
+        questions = [line.rstrip("\n") for line in file]
+    with tempfile.TemporaryDirectory() as work_path:
+        result = globals()["bench_" + name](corpus_path, work_path, questions)
+    print(json.dumps(result))
+
+
+def measure(name, corpus_path, questions_path):
+    output = subprocess.run([sys.executable, "-W", "ignore", os.path.realpath(__file__), "--child", name,
+                             "--corpus", corpus_path, "--questions", questions_path],
+                            check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            universal_newlines=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(["git", "-C", root_path, "rev-parse", "HEAD"], check=True,
+                                  stdout=subprocess.PIPE, universal_newlines=True).stdout.strip()
+        dirty = subprocess.run(["git", "-C", root_path, "status", "--porcelain", "--untracked-files=no"],
+                               check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout.strip()
+        return revision + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, old_results):
+    print("\n{:<36} {:>14} {:>14} {:>8}".format("", "old", "new", "new/old"))
+    for name, result in results["benchmarks"].items():
+        old = old_results["benchmarks"].get(name, {}).get("median", {})
+        for key, value in result["median"].items():
+            if key in old and old[key]:
+                print("{:<36} {:>14.4g} {:>14.4g} {:>8.2f}".format(name + "." + key, old[key], value,
+                                                                   value / old[key]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1, help="size of corpus relative to medical.json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--num-questions", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each benchmark, the median is reported")
+    parser.add_argument("--benchmarks", default=",".join(benchmarks))
+    parser.add_argument("--output", help="path of the result file, by default data/benchmark/<time>.json")
+    parser.add_argument("--compare", help="result file of an earlier run to compare with")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--corpus", help=argparse.SUPPRESS)
+    parser.add_argument("--questions", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.corpus, args.questions)
+        return
+
+    started = datetime.datetime.now()
+    results = {
+        "revision": git_revision(),
+        "started": started.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": {"scale": args.scale, "seed": args.seed, "num_questions": args.num_questions,
+                 "repeat": args.repeat},
+        "benchmarks": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp_path:
+        corpus_path = os.path.join(tmp_path, "medical.json")
+        generate_corpus(corpus_path, int(sample_size * args.scale), args.seed)
+        questions_path = os.path.join(tmp_path, "questions.txt")
+        with open(questions_path, "w", encoding="utf-8") as file:
+            for question in generate_questions(corpus_path, args.num_questions, args.seed):
+                file.write(question + "\n")
+
+        for name in args.benchmarks.split(","):
+            print("Running {}...".format(name))
+            runs = [measure(name, corpus_path, questions_path) for _ in range(args.repeat)]
+            results["benchmarks"][name] = {"runs": runs,
+                                           "median": {key: median([run[key] for run in runs]) for key in runs[0]}}
+            for key, value in results["benchmarks"][name]["median"].items():
+                print("  {:<34} {:>14.4g}".format(key, value))
+
+    output_path = args.output or os.path.join(root_path, "data", "benchmark",
+                                              started.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print("Results are saved to {}".format(output_path))
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            compare(results, json.load(file))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+@desc: Synthetic medical.json and questions about it, for benchmarks and tests.
+
+Usage:
+    python scripts/generate_corpus.py --scale 10 --output data/medical.json [--questions data/questions.txt]
+
+Every record has the fields read by `build_kg.parse_record`, and the numbers of related
+entities of each kind, and the sizes of the pools they are drawn from, roughly follow the
+medical.json crawled from xywy.com, so a corpus at scale 1 builds a graph of about its
+size. The same seed and scale always give the same corpus.
+"""
+import argparse
+import json
+import random
+
+# number of lines of the medical.json crawled from xywy.com
+sample_size = 8808
+
+# (field of record, prefix of names, size of pool at scale 1, min and max number in a record),
+# in the order they are drawn
+list_field_shapes = [
+    ("cure_department", "科室", 54, 1, 2),
+    ("symptom", "症状", 5998, 1, 8),
+    ("acompany", "疾病", 8808, 0, 3),
+    ("recommand_drug", "药品", 3828, 0, 8),
+    ("common_drug", "药品", 3828, 0, 3),
+    ("check", "检查", 3353, 1, 6),
+    ("not_eat", "食物", 4870, 0, 4),
+    ("do_eat", "食物", 4870, 0, 4),
+    ("recommand_eat", "食谱", 4870, 0, 8),
+    ("cure_way", "疗法", 544, 1, 3),
+]
+
+# questions of the intents of app.query.intent_plans, with the types of names they mention
+question_templates = [
+    ("{disease}吃什么药", ("disease",)),
+    ("{disease}有哪些症状", ("disease",)),
+    ("{disease}怎么治疗", ("disease",)),
+    ("{disease}是什么原因引起的", ("disease",)),
+    ("{disease}挂什么科", ("disease",)),
+    ("{disease}要做什么检查", ("disease",)),
+    ("{disease}不能吃什么", ("disease",)),
+    ("{disease}会引起什么并发症", ("disease",)),
+    ("{disease}能治好吗", ("disease",)),
+    ("{drug}能治什么病", ("drug",)),
+    ("{symptom}是什么病", ("symptom",)),
+    ("最近总是{symptom}，还有{symptom}，是怎么回事", ("symptom", "symptom")),
+]
+
+
+def generate_corpus(file_path, num_records, seed=0):
+    """Write a synthetic medical.json with roughly the shape of the crawled one. """
+    rnd = random.Random(seed)
+    scale = num_records / sample_size
+
+    def pick(prefix, pool_size, low, high):
+        return ["{}{}".format(prefix, rnd.randrange(max(int(pool_size * scale), 1)))
+                for _ in range(rnd.randint(low, high))]
+
+    with open(file_path, "w", encoding="utf-8") as file:
+        for no in range(num_records):
+            record = {
+                "name": "疾病{}".format(no),
+                "desc": "疾病{}的描述。".format(no) * 20,
+                "prevent": "预防措施。" * 20,
+                "cause": "病因。" * 20,
+                "easy_get": "所有人群",
+                "cure_lasttime": "1-2个月",
+                "cured_prob": "85%",
+                "cost_money": "根据不同医院，收费标准不一致",
+                "yibao_status": "否",
+                "get_prob": "0.01%",
+                "get_way": "无传染性",
+            }
+            for field, prefix, pool_size, low, high in list_field_shapes:
+                record[field] = pick(prefix, pool_size, low, high)
+            record["drug_detail"] = ["{}({})".format(company, drug) for company, drug in
+                                     zip(pick("药业公司", 17201, 0, 8), pick("药品", 3828, 8, 8))]
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def read_corpus_names(file_path):
+    """Names of diseases, drugs and symptoms found in a corpus, each sorted. """
+    names = {"disease": set(), "drug": set(), "symptom": set()}
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            record = json.loads(line)
+            names["disease"].add(record["name"])
+            names["drug"].update(record.get("recommand_drug", []) + record.get("common_drug", []))
+            names["symptom"].update(record.get("symptom", []))
+    return {kind: sorted(values) for kind, values in names.items()}
+
+
+def generate_questions(corpus_path, num_questions, seed=0):
+    """Questions made from `question_templates` and names of entities in a corpus. """
+    rnd = random.Random(seed)
+    names = read_corpus_names(corpus_path)
+    questions = []
+    for _ in range(num_questions):
+        template, kinds = rnd.choice(question_templates)
+        values = [rnd.choice(names[kind]) for kind in kinds]
+        # every placeholder is filled in turn, so a template may mention a kind twice
+        for kind, value in zip(kinds, values):
+            template = template.replace("{" + kind + "}", value, 1)
+        questions.append(template)
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1, help="size of corpus relative to medical.json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="path of the corpus")
+    parser.add_argument("--questions", help="path to write questions about the corpus, one a line")
+    parser.add_argument("--num-questions", type=int, default=1000)
+    args = parser.parse_args()
+
+    num_records = int(sample_size * args.scale)
+    print("Generating {} records to {}...".format(num_records, args.output))
+    generate_corpus(args.output, num_records, args.seed)
+    if args.questions:
+        with open(args.questions, "w", encoding="utf-8") as file:
+            for question in generate_questions(args.output, args.num_questions, args.seed):
+                file.write(question + "\n")
+
+
+if __name__ == '__main__':
+    main()
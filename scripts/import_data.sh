@@ -1,13 +1,15 @@
 #!/bin/bash
 
 CUR_PATH=$(cd $(dirname $0); pwd)
+# data files may be exported as .csv or gzip compressed .csv.gz
+shopt -s nullglob
 
 
 # find all entity data files
 ENTITY_DAT_PATH=$(cd ${CUR_PATH}/../data/entity; pwd)
 echo "Finding all entity data files in directory ${ENTITY_DAT_PATH}"
 COMMAND_NODES=""
-for file in ${ENTITY_DAT_PATH}/*.csv
+for file in ${ENTITY_DAT_PATH}/*.csv ${ENTITY_DAT_PATH}/*.csv.gz
 do
     COMMAND_NODES+="--nodes=${file} "
 done
@@ -17,7 +19,7 @@ done
 RELATIONSHIP_DAT_PATH=$(cd ${CUR_PATH}/../data/relationship; pwd)
 echo "Finding all relationship data files in directory ${RELATIONSHIP_DAT_PATH}"
 COMMAND_RELS=""
-for file in ${RELATIONSHIP_DAT_PATH}/*.csv
+for file in ${RELATIONSHIP_DAT_PATH}/*.csv ${RELATIONSHIP_DAT_PATH}/*.csv.gz
 do
     COMMAND_RELS+="--relationships=${file} "
 done
@@ -25,9 +27,10 @@ done
 COMMAND="bin/neo4j-admin import --multiline-fields=true --database=disease.db ${COMMAND_NODES} ${COMMAND_RELS}"
 
 
-NEO4J_PATH="/Users/yangqj/Documents/Install_Package/neo4j-community-3.5.31"
+# neo4j-admin import needs a new and stopped database, use build_kg.py --load for a running one
+NEO4J_PATH=${NEO4J_HOME:-"/Users/yangqj/Documents/Install_Package/neo4j-community-3.5.31"}
 cd ${NEO4J_PATH}
-ECHO "start import data $(date)"
+echo "start import data $(date)"
 $COMMAND
-ECHO "finish import data $(date)"
+echo "finish import data $(date)"
 
@@ -0,0 +1,37 @@
+"""
+Fixtures shared by the tests: a small synthetic corpus and the graph extracted from it.
+"""
+import os
+import sys
+
+import pytest
+
+root_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, root_path)
+
+from build_kg import DiseaseGraphExtractor
+from scripts.generate_corpus import generate_corpus
+
+# records of the corpus, enough for every type of entity and relationship to occur
+num_records = 300
+
+
+@pytest.fixture(scope="session")
+def corpus_path(tmp_path_factory):
+    file_path = str(tmp_path_factory.mktemp("corpus") / "medical.json")
+    generate_corpus(file_path, num_records)
+    return file_path
+
+
+@pytest.fixture(scope="session")
+def extractor(corpus_path, tmp_path_factory):
+    extractor = DiseaseGraphExtractor(output_path=str(tmp_path_factory.mktemp("graph")))
+    extractor.extract(corpus_path)
+    return extractor
+
+
+@pytest.fixture(scope="session")
+def snapshot_path(extractor):
+    file_path = os.path.join(extractor.output_path, "graph.snapshot")
+    extractor.export_snapshot(file_path)
+    return file_path
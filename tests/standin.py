@@ -0,0 +1,198 @@
+"""
+@desc: In-process stand-ins of a neo4j driver for testing the Cypher backend and the bulk
+loader without a database.
+"""
+import re
+import threading
+
+from app.kg.bulk_loader import parse_version, version_statement
+
+_attribute_pattern = re.compile(
+    r"^UNWIND \$names AS name MATCH \(n:(\w+) \{name: name\}\) RETURN name, n \{(.*)\} AS props$")
+_relationship_pattern = re.compile(
+    r"^UNWIND \$names AS name MATCH \(n:(\w+) \{name: name\}\)(<?)-\[:(\w+)\]-(>?)\(m\) "
+    r"RETURN name, collect\(m.name\) AS names$")
+_constraint_pattern = re.compile(r"^CREATE CONSTRAINT (?:\w+ IF NOT EXISTS FOR \(n:(\w+)\) REQUIRE|"
+                                 r"ON \(n:(\w+)\) ASSERT) n.name IS UNIQUE$")
+_node_pattern = re.compile(r"^UNWIND \$rows AS row MERGE \(n:(\w+) \{name: row.name\}\) SET n.id = row.id"
+                           r"( SET n \+= row.props)?$")
+_edge_pattern = re.compile(r"^UNWIND \$rows AS row MATCH \(a:(\w+) \{name: row.start\}\) "
+                           r"MATCH \(b:(\w+) \{name: row.end\}\) MERGE \(a\)-\[:(\w+)\]->\(b\)$")
+
+
+class StandInDriver(object):
+    """Answers the statements generated by `CypherBackend` from a `GraphSnapshot`.
+
+    Every statement run is recorded in `statements` as (statement, parameters), which
+    lets tests check how queries are batched.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.statements = []
+        self.closed = False
+
+    def session(self, **kwargs):
+        return StandInSession(self)
+
+    def close(self):
+        self.closed = True
+
+
+class StandInSession(object):
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def run(self, statement, parameters=None, **kwargs):
+        parameters = dict(parameters or {}, **kwargs)
+        self.driver.statements.append((statement, parameters))
+        snapshot = self.driver.snapshot
+
+        res = _attribute_pattern.match(statement)
+        if res:
+            label = res.group(1)
+            attrs = [attr.strip()[1:] for attr in res.group(2).split(",")]
+            records = []
+            for name in parameters["names"]:
+                node = snapshot.find(label, name)
+                if node is not None:
+                    records.append({"name": name, "props": {attr: snapshot.attribute(node, attr) or None
+                                                            for attr in attrs}})
+            return records
+
+        res = _relationship_pattern.match(statement)
+        if res:
+            label, reverse, rel_type = res.group(1), res.group(2) == "<", res.group(3)
+            records = []
+            for name in parameters["names"]:
+                node = snapshot.find(label, name)
+                if node is not None:
+                    targets = snapshot.neighbors(rel_type, node, reverse).tolist()
+                    if targets:
+                        records.append({"name": name, "names": [snapshot.name_of(n) for n in targets]})
+            return records
+
+        raise ValueError("Statement is not supported by the stand-in: {}".format(statement))
+
+
+class StandInResult(list):
+    def consume(self):
+        pass
+
+    def single(self):
+        return self[0] if self else None
+
+
+class StandInClientError(Exception):
+    """An error of the server, with a neo4j status code like `neo4j.exceptions.ClientError`. """
+
+    def __init__(self, code, message):
+        super(StandInClientError, self).__init__(message)
+        self.code = code
+
+
+class StandInWriteDriver(object):
+    """Applies the statements generated by `app.kg.bulk_loader.BulkLoader` to an in-memory graph.
+
+    Constraints are kept in `constraints`, and every batch written in `batches` as
+    (statement, rows). Entities are kept in `nodes` as {type: {name: properties}} and
+    relationships in `relationships` as {type: set of (start name, end name)}. Like neo4j,
+    a relationship whose ends are not found is not created, but it is counted in
+    `missing_ends`. Merging an entity of a type without a uniqueness constraint raises an
+    error, so tests can check that constraints come first. The server reports itself as
+    neo4j `version`, and like neo4j 4.0 to 4.3 it refuses to create a constraint again
+    without IF NOT EXISTS.
+    """
+
+    def __init__(self, version="5.13.0"):
+        self.version = version
+        self.constraints = set()
+        self.batches = []
+        self.nodes = {}
+        self.relationships = {}
+        self.missing_ends = 0
+        self.sessions = 0
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def session(self, **kwargs):
+        with self.lock:
+            self.sessions += 1
+        return StandInWriteSession(self)
+
+    def close(self):
+        self.closed = True
+
+    def apply(self, statement, parameters):
+        with self.lock:
+            if statement == version_statement:
+                return StandInResult([{"version": self.version}])
+
+            res = _constraint_pattern.match(statement)
+            if res:
+                label = res.group(1) or res.group(2)
+                if res.group(2) and label in self.constraints and \
+                        (4, 0) <= parse_version(self.version) < (4, 4):
+                    raise StandInClientError("Neo.ClientError.Schema.EquivalentSchemaRuleAlreadyExists",
+                                             "An equivalent constraint already exists on {}".format(label))
+                self.constraints.add(label)
+                return StandInResult()
+
+            rows = parameters["rows"]
+            res = _node_pattern.match(statement)
+            if res:
+                label = res.group(1)
+                if label not in self.constraints:
+                    raise ValueError("No uniqueness constraint on names of {}".format(label))
+                self.batches.append((statement, rows))
+                nodes = self.nodes.setdefault(label, {})
+                for row in rows:
+                    props = nodes.setdefault(row["name"], {})
+                    props["id"] = row["id"]
+                    if res.group(2):
+                        props.update(row["props"])
+                return StandInResult()
+
+            res = _edge_pattern.match(statement)
+            if res:
+                from_type, to_type, rel_type = res.groups()
+                self.batches.append((statement, rows))
+                starts, ends = self.nodes.get(from_type, {}), self.nodes.get(to_type, {})
+                relationships = self.relationships.setdefault(rel_type, set())
+                for row in rows:
+                    if row["start"] in starts and row["end"] in ends:
+                        relationships.add((row["start"], row["end"]))
+                    else:
+                        self.missing_ends += 1
+                return StandInResult()
+
+        raise ValueError("Statement is not supported by the stand-in: {}".format(statement))
+
+
+class StandInWriteSession(object):
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def run(self, statement, parameters=None, **kwargs):
+        return self.driver.apply(statement, dict(parameters or {}, **kwargs))
+
+    def execute_write(self, transaction_function, *args, **kwargs):
+        return transaction_function(self, *args, **kwargs)
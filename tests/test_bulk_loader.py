@@ -0,0 +1,61 @@
+"""
+Loading the graph into the stand-in write driver, on servers of every supported version.
+"""
+import pytest
+
+from app.kg.bulk_loader import BulkLoader, constraint_statement
+from app.kg.schema import entity_type_disease, entity_types, relationship_types
+from tests.standin import StandInWriteDriver
+
+versions = ["3.5.31", "4.0.0", "4.3.0", "4.4.12", "5.13.0", "2025.01.0"]
+
+
+def test_loaded_graph_equals_store(extractor):
+    store = extractor.store
+    driver = StandInWriteDriver()
+    num_nodes, num_edges = BulkLoader(driver, batch_size=500).load(store)
+
+    assert num_nodes == store.num_entities()
+    assert num_edges == store.num_relationships()
+    assert driver.missing_ends == 0
+    for label, _ in entity_types:
+        nodes = driver.nodes.get(label, {})
+        assert {name: props["id"] for name, props in nodes.items()} == \
+            {store.name_of(i): i for i in store.entity_ids(label).tolist()}
+    for identity in store.entity_ids(entity_type_disease).tolist()[:20]:
+        props = driver.nodes[entity_type_disease][store.name_of(identity)]
+        for attr, value in zip(store.attributes, store.attribute_values(identity)):
+            assert props.get(attr) == value
+    for rel_type, _, _, _ in relationship_types:
+        assert driver.relationships.get(rel_type, set()) == \
+            {(store.name_of(start), store.name_of(end)) for start, end in store.edges(rel_type).tolist()}
+
+
+def test_batches_are_bounded(extractor):
+    driver = StandInWriteDriver()
+    BulkLoader(driver, batch_size=100, num_sessions=3).load(extractor.store)
+    assert max(len(rows) for _, rows in driver.batches) == 100
+
+
+@pytest.mark.parametrize("version", versions)
+def test_reload_over_loaded_graph(extractor, version):
+    driver = StandInWriteDriver(version)
+    loader = BulkLoader(driver, batch_size=1000)
+    first = loader.load(extractor.store)
+    nodes = {label: dict(nodes) for label, nodes in driver.nodes.items()}
+    assert loader.load(extractor.store) == first
+    assert driver.nodes == nodes
+
+
+def test_duplicate_constraint_is_refused_on_4_0_to_4_3():
+    driver = StandInWriteDriver("4.2.0")
+    with driver.session() as session:
+        session.run(constraint_statement(entity_type_disease, (4, 2)))
+        with pytest.raises(Exception):
+            session.run(constraint_statement(entity_type_disease, (4, 2)))
+
+
+@pytest.mark.parametrize("version, database", [("3.4.0", None), ("3.5.31", "disease")])
+def test_unsupported_server_is_refused(extractor, version, database):
+    with pytest.raises(ValueError):
+        BulkLoader(StandInWriteDriver(version), database).load(extractor.store)
@@ -0,0 +1,42 @@
+"""
+Parallel sharded extraction gives the graph and files of a sequential one.
+"""
+import os
+
+import pytest
+
+from build_kg import DiseaseGraphExtractor, extract_shard, split_shards
+
+
+def export_files(corpus_path, output_path, **kwargs):
+    """{relative path: bytes} of every file exported from a build. """
+    extractor = DiseaseGraphExtractor(output_path=output_path)
+    extractor.extract(corpus_path, **kwargs)
+    extractor.export_graph(compress=True)
+    extractor.export_snapshot()
+    extractor.export_as_dictionary()
+    files = {}
+    for root, _, names in os.walk(output_path):
+        for name in names:
+            with open(os.path.join(root, name), "rb") as file:
+                files[os.path.relpath(os.path.join(root, name), output_path)] = file.read()
+    return files
+
+
+@pytest.mark.parametrize("num_shards", [1, 7, 64])
+def test_shards_cover_every_line_once(corpus_path, num_shards):
+    shards = split_shards(corpus_path, os.path.getsize(corpus_path), num_shards)
+    names = [record[0] for shard in shards for record in extract_shard(shard)]
+    with open(corpus_path, "rb") as file:
+        num_lines = sum(1 for _ in file)
+    assert len(names) == num_lines
+    assert names == ["疾病{}".format(no) for no in range(num_lines)]
+
+
+def test_parallel_export_is_byte_identical(corpus_path, tmp_path):
+    sequential = export_files(corpus_path, str(tmp_path / "sequential"))
+    parallel = export_files(corpus_path, str(tmp_path / "parallel"), num_workers=3, num_shards=17)
+    assert sorted(parallel) == sorted(sequential)
+    assert any(path.endswith(".csv.gz") for path in sequential)
+    for path in sequential:
+        assert parallel[path] == sequential[path], path
@@ -0,0 +1,87 @@
+"""
+Incremental builds give the ids and the graph of a full build of the same file.
+"""
+import json
+import os
+
+from app.kg.schema import entity_types, relationship_types
+from build_kg import DiseaseGraphExtractor
+from scripts.generate_corpus import generate_corpus
+
+
+def full_build(file_path):
+    extractor = DiseaseGraphExtractor()
+    extractor.extract(file_path)
+    return extractor.store
+
+
+def named_edges(store, edges):
+    return {(rel_type, store.name_of(start), store.name_of(end)) for rel_type, start, end in edges}
+
+
+def store_edges(store):
+    return named_edges(store, [(rel_type, start, end) for rel_type, _, _, _ in relationship_types
+                               for start, end in store.edges(rel_type).tolist()])
+
+
+def edit_corpus(file_path, new_path, extra_path):
+    """Change the symptoms of some records, drop some and append others. """
+    with open(file_path, "r", encoding="utf-8") as file:
+        lines = file.readlines()
+    with open(extra_path, "r", encoding="utf-8") as file:
+        extra = file.readlines()[:20]
+    records = []
+    for no, line in enumerate(lines):
+        if no % 10 == 3:
+            continue
+        record = json.loads(line)
+        if no % 10 == 5:
+            record["symptom"] = record["symptom"][1:] + ["新症状{}".format(no)]
+        records.append(json.dumps(record, ensure_ascii=False) + "\n")
+    # the appended records are about new diseases
+    for no, line in enumerate(extra):
+        record = json.loads(line)
+        record["name"] = "新疾病{}".format(no)
+        records.append(json.dumps(record, ensure_ascii=False) + "\n")
+    with open(new_path, "w", encoding="utf-8") as file:
+        file.writelines(records)
+
+
+def test_first_incremental_build_equals_full_build(corpus_path, tmp_path):
+    full = full_build(corpus_path)
+    extractor = DiseaseGraphExtractor(output_path=str(tmp_path))
+    delta = extractor.extract_incremental(corpus_path, str(tmp_path / "state.pkl"))
+
+    for label, _ in entity_types:
+        for identity in full.entity_ids(label).tolist():
+            assert extractor.store.get_id(label, full.name_of(identity)) == identity
+    assert named_edges(extractor.store, delta.edges_added) == store_edges(full)
+    assert not delta.edges_removed and not delta.nodes_removed
+
+
+def test_incremental_builds_follow_edits(corpus_path, tmp_path):
+    state_path = str(tmp_path / "state.pkl")
+    extractor = DiseaseGraphExtractor(output_path=str(tmp_path))
+    delta = extractor.extract_incremental(corpus_path, state_path)
+    alive = named_edges(extractor.store, delta.edges_added)
+
+    extra_path, new_path = str(tmp_path / "extra.json"), str(tmp_path / "new.json")
+    generate_corpus(extra_path, 20, seed=1)
+    edit_corpus(corpus_path, new_path, extra_path)
+    extractor = DiseaseGraphExtractor(output_path=str(tmp_path))
+    delta = extractor.extract_incremental(new_path, state_path)
+    assert delta.version == 2
+    assert delta.edges_removed and delta.edges_added
+    alive -= named_edges(extractor.store, delta.edges_removed)
+    alive |= named_edges(extractor.store, delta.edges_added)
+
+    full = full_build(new_path)
+    assert alive == store_edges(full)
+    for label, _ in entity_types:
+        alive_names = {extractor.store.name_of(i) for i in extractor.alive_ids
+                       if extractor.store.label_of(i) == label}
+        assert alive_names == set(full.entity_names(label))
+
+    # the delta is exported like a full export
+    extractor.export_delta(delta)
+    assert os.listdir(os.path.join(str(tmp_path), "delta", "2", "added", "relationship"))
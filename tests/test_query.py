@@ -0,0 +1,55 @@
+"""
+The Cypher backend, run against the stand-in driver, gives the same facts as the local one.
+"""
+import random
+
+import pytest
+
+from app.kg.snapshot import GraphSnapshot
+from app.query import Query, QueryEngine, intent_plans
+from app.query.cypher import CypherBackend
+from app.query.local import LocalBackend
+from tests.standin import StandInDriver
+
+
+@pytest.fixture(scope="module")
+def snapshot(snapshot_path):
+    snapshot = GraphSnapshot(snapshot_path)
+    yield snapshot
+    snapshot.close()
+
+
+def sample_queries(snapshot, num_names=30, seed=0):
+    """Queries of every intent and type of entity planned for it, about existing entities and one missing. """
+    rnd = random.Random(seed)
+    queries = []
+    for intent, plans in sorted(intent_plans.items()):
+        for label in sorted(plans):
+            start, stop = snapshot.label_ranges[label]
+            names = [snapshot.name_of(n) for n in rnd.sample(range(start, stop), min(num_names, stop - start))]
+            queries.extend(Query(intent, [(label, name)]) for name in names + ["不存在的实体"])
+    return queries
+
+
+def test_backends_give_same_facts(snapshot):
+    queries = sample_queries(snapshot)
+    local = QueryEngine(LocalBackend(snapshot)).execute_many(queries)
+    cypher = QueryEngine(CypherBackend(StandInDriver(snapshot))).execute_many(queries)
+    assert len(queries) > 300
+    assert cypher == local
+    assert any(fact.values for facts in local for fact in facts)
+
+
+def test_queries_of_a_batch_share_statements(snapshot):
+    queries = sample_queries(snapshot)
+    driver = StandInDriver(snapshot)
+    QueryEngine(CypherBackend(driver)).execute_many(queries)
+    steps = {(label, step) for query in queries for label, _, step in query.steps()}
+    # one statement for the attributes of a type, and one for each relationship step
+    assert len(driver.statements) <= len(steps)
+
+
+def test_one_query_is_answered_like_a_batch(snapshot):
+    engine = QueryEngine(CypherBackend(StandInDriver(snapshot)))
+    queries = sample_queries(snapshot, num_names=3)
+    assert [engine.execute(query) for query in queries] == engine.execute_many(queries)
@@ -0,0 +1,45 @@
+"""
+Scores of the symptom ranker are cosine similarities, and rankings are deterministic.
+"""
+import numpy as np
+
+from app.kg.snapshot import GraphSnapshot
+from app.query.symptom_ranker import SymptomRanker
+
+
+def brute_force(ranker, symptoms):
+    """{disease: cosine similarity} computed densely, for diseases sharing a symptom. """
+    matrix = ranker.matrix.toarray()
+    query = np.zeros(len(ranker.symptom_names))
+    query[[ranker.symptom_index[s] for s in set(symptoms)]] = 1
+    scores = matrix.dot(query) / np.linalg.norm(query)
+    return {ranker.disease_names[d]: scores[d] for d in np.flatnonzero(scores)}
+
+
+def test_scores_are_cosine_similarities(snapshot_path):
+    snapshot = GraphSnapshot(snapshot_path)
+    ranker = SymptomRanker.from_snapshot(snapshot)
+    for no in range(0, len(ranker.symptom_names), 97):
+        symptoms = ranker.symptom_names[no:no + 3]
+        expected = brute_force(ranker, symptoms)
+        ranking = ranker.rank(symptoms + ["不存在的症状"], top_k=len(expected))
+        assert {name for name, _ in ranking} == set(expected)
+        assert all(abs(score - expected[name]) < 1e-5 for name, score in ranking)
+        assert all(score <= 1 + 1e-6 for _, score in ranking)
+    snapshot.close()
+
+
+def test_identical_symptoms_score_1():
+    ranker = SymptomRanker(["A"], ["x", "y", "z"], [0, 0, 0], [0, 1, 2])
+    (name, score), = ranker.rank(["x", "y", "z"])
+    assert name == "A" and abs(score - 1) < 1e-6
+
+
+def test_ties_at_the_cut_are_broken_by_index():
+    # 50 diseases with the same symptoms score the same
+    num_diseases = 50
+    names = ["疾病{}".format(no) for no in range(num_diseases)]
+    ranker = SymptomRanker(names, ["x", "y"], list(range(num_diseases)) * 2,
+                           [0] * num_diseases + [1] * num_diseases)
+    for top_k in (1, 5, 17):
+        assert [name for name, _ in ranker.rank(["x", "y"], top_k)] == names[:top_k]